@@ -1,26 +1,13 @@
 """Instagram content generation agent."""
 
 import logging
-from app.types import MessageDict, Platform
-from app.services.openai_service import OpenAIService
+from collections.abc import Sequence
+from app.types import MessageDict, MessageRole, Platform
+from app.services.openai_service import get_openai_service
 
 logger = logging.getLogger(__name__)
 
-
-class InstagramAgent:
-    """Generates Instagram-optimized captions."""
-    
-    platform: Platform = Platform.INSTAGRAM
-    
-    def __init__(self):
-        """Initialize Instagram agent."""
-        self.openai = OpenAIService()
-    
-    async def create_post(self, prompt: str, history: list[MessageDict]) -> str:
-        """Create an Instagram caption."""
-        logger.info("InstagramAgent creating post")
-        
-        system_prompt = """You are an expert Instagram content creator.
+_SYSTEM_PROMPT = """You are an expert Instagram content creator.
 
 INSTAGRAM CAPTION CHARACTERISTICS:
 - Visual-first: complement the image
@@ -36,17 +23,54 @@ INSTAGRAM CAPTION CHARACTERISTICS:
 TONE: Authentic, personal, inspirational
 
 Create an Instagram caption."""
+
+_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _SYSTEM_PROMPT}
+
+
+class InstagramAgent:
+    """Generates Instagram-optimized captions."""
+    
+    platform: Platform = Platform.INSTAGRAM
+    system_prompt: str = _SYSTEM_PROMPT
+    temperature: float = 0.7
+    max_tokens: int = 600
+    
+    def __init__(self):
+        """Initialize Instagram agent."""
+        self.openai = get_openai_service()
+    
+    def build_messages(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> tuple[MessageDict, ...]:
+        """Build the chat messages for a post request (history is pre-trimmed)."""
+        return (
+            _SYSTEM_MSG,
+            *history,
+            {"role": MessageRole.USER, "content": prompt},
+        )
+    
+    def finalize(self, post: str) -> str:
+        """Return generated content unchanged; no post-processing needed."""
+        return post
+    
+    async def create_post(self, prompt: str, history: Sequence[MessageDict]) -> str:
+        """Create an Instagram caption."""
+        logger.info("InstagramAgent creating post")
         
-        messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-3:],
-            {"role": "user", "content": prompt},
-        ]
+        messages = self.build_messages(prompt, history)
         
         try:
-            post = await self.openai.complete(messages, temperature=0.7, max_tokens=600)
+            post = await self.openai.complete(
+                messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                cache_key=f"agent:{self.platform.value}",
+            )
+            post = self.finalize(post)
             logger.info("InstagramAgent post created")
             return post
-        except Exception as e:
-            logger.error(f"Error creating Instagram post: {e}")
+        except Exception:
+            logger.exception("Error creating Instagram post")
             raise
@@ -5,11 +5,31 @@ Creates professional, engaging LinkedIn posts optimized for the platform.
 """
 
 import logging
-from app.types import MessageDict, Platform
-from app.services.openai_service import OpenAIService
+from collections.abc import Sequence
+from app.types import MessageDict, MessageRole, Platform
+from app.services.openai_service import get_openai_service
 
 logger = logging.getLogger(__name__)
 
+_SYSTEM_PROMPT = """You are an expert LinkedIn content creator.
+
+LINKEDIN POST CHARACTERISTICS:
+- Professional yet conversational and authentic
+- Start with an attention-grabbing hook
+- Use storytelling and personal insights
+- Demonstrate thought leadership
+- Include actionable insights
+- Short paragraphs with line breaks
+- End with engagement (question or CTA)
+- 3-5 relevant hashtags at end
+- 150-300 words optimal
+
+TONE: Professional, confident, educational, engaging
+
+Create a LinkedIn post based on the user's request."""
+
+_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _SYSTEM_PROMPT}
+
 
 class LinkedInAgent:
     """
@@ -24,18 +44,37 @@ class LinkedInAgent:
     """
     
     platform: Platform = Platform.LINKEDIN
+    system_prompt: str = _SYSTEM_PROMPT
+    temperature: float = 0.7
+    max_tokens: int = 800
     
     def __init__(self):
         """Initialize LinkedIn agent."""
-        self.openai = OpenAIService()
+        self.openai = get_openai_service()
+    
+    def build_messages(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> tuple[MessageDict, ...]:
+        """Build the chat messages for a post request (history is pre-trimmed)."""
+        return (
+            _SYSTEM_MSG,
+            *history,
+            {"role": MessageRole.USER, "content": prompt},
+        )
     
-    async def create_post(self, prompt: str, history: list[MessageDict]) -> str:
+    def finalize(self, post: str) -> str:
+        """Return generated content unchanged; no post-processing needed."""
+        return post
+    
+    async def create_post(self, prompt: str, history: Sequence[MessageDict]) -> str:
         """
         Create a LinkedIn post.
         
         Args:
             prompt: User's content request
-            history: Recent conversation history for context
+            history: Recent conversation history, already trimmed by the caller
             
         Returns:
             Generated LinkedIn post
@@ -45,33 +84,18 @@ class LinkedInAgent:
         """
         logger.info("LinkedInAgent creating post")
         
-        system_prompt = """You are an expert LinkedIn content creator.
-
-LINKEDIN POST CHARACTERISTICS:
-- Professional yet conversational and authentic
-- Start with an attention-grabbing hook
-- Use storytelling and personal insights
-- Demonstrate thought leadership
-- Include actionable insights
-- Short paragraphs with line breaks
-- End with engagement (question or CTA)
-- 3-5 relevant hashtags at end
-- 150-300 words optimal
-
-TONE: Professional, confident, educational, engaging
-
-Create a LinkedIn post based on the user's request."""
-        
-        messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-3:],
-            {"role": "user", "content": prompt},
-        ]
+        messages = self.build_messages(prompt, history)
         
         try:
-            post = await self.openai.complete(messages, temperature=0.7, max_tokens=800)
+            post = await self.openai.complete(
+                messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                cache_key=f"agent:{self.platform.value}",
+            )
+            post = self.finalize(post)
             logger.info("LinkedInAgent post created successfully")
             return post
-        except Exception as e:
-            logger.error(f"Error creating LinkedIn post: {e}")
+        except Exception:
+            logger.exception("Error creating LinkedIn post")
             raise
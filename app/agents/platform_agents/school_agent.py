@@ -1,26 +1,13 @@
 """School community content generation agent."""
 
 import logging
-from app.types import MessageDict, Platform
-from app.services.openai_service import OpenAIService
+from collections.abc import Sequence
+from app.types import MessageDict, MessageRole, Platform
+from app.services.openai_service import get_openai_service
 
 logger = logging.getLogger(__name__)
 
-
-class SchoolAgent:
-    """Generates School community-optimized posts."""
-    
-    platform: Platform = Platform.SCHOOL
-    
-    def __init__(self):
-        """Initialize School agent."""
-        self.openai = OpenAIService()
-    
-    async def create_post(self, prompt: str, history: list[MessageDict]) -> str:
-        """Create a School community post."""
-        logger.info("SchoolAgent creating post")
-        
-        system_prompt = """You are an expert community manager for School platform.
+_SYSTEM_PROMPT = """You are an expert community manager for School platform.
 
 SCHOOL POST CHARACTERISTICS:
 - Community-focused and collaborative
@@ -35,23 +22,58 @@ SCHOOL POST CHARACTERISTICS:
 TONE: Warm, expert but approachable, community-oriented
 
 Create a School community post."""
+
+_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _SYSTEM_PROMPT}
+
+
+class SchoolAgent:
+    """Generates School community-optimized posts."""
+    
+    platform: Platform = Platform.SCHOOL
+    system_prompt: str = _SYSTEM_PROMPT
+    temperature: float = 0.7
+    max_tokens: int = 700
+    
+    def __init__(self):
+        """Initialize School agent."""
+        self.openai = get_openai_service()
+    
+    def build_messages(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> tuple[MessageDict, ...]:
+        """Build the chat messages for a post request (history is pre-trimmed)."""
+        return (
+            _SYSTEM_MSG,
+            *history,
+            {"role": MessageRole.USER, "content": prompt},
+        )
+    
+    def finalize(self, post: str) -> str:
+        """Add the community signature if the model left it out."""
+        if "Love an automation" not in post:
+            post += "\n\nLove an automation,\nJack"
+        return post
+    
+    async def create_post(self, prompt: str, history: Sequence[MessageDict]) -> str:
+        """Create a School community post."""
+        logger.info("SchoolAgent creating post")
         
-        messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-3:],
-            {"role": "user", "content": prompt},
-        ]
+        messages = self.build_messages(prompt, history)
         
         try:
-            post = await self.openai.complete(messages, temperature=0.7, max_tokens=700)
-            
-            # Add signature if not present
-            if "Love an automation" not in post:
-                post += "\n\nLove an automation,\nJack"
+            post = await self.openai.complete(
+                messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                cache_key=f"agent:{self.platform.value}",
+            )
+            post = self.finalize(post)
             
             logger.info("SchoolAgent post created")
             return post
             
-        except Exception as e:
-            logger.error(f"Error creating School post: {e}")
+        except Exception:
+            logger.exception("Error creating School post")
             raise
@@ -5,11 +5,29 @@ Creates concise, engaging posts for X with strict character limits.
 """
 
 import logging
-from app.types import MessageDict, Platform
-from app.services.openai_service import OpenAIService
+from collections.abc import Sequence
+from app.types import MessageDict, MessageRole, Platform
+from app.services.openai_service import get_openai_service
 
 logger = logging.getLogger(__name__)
 
+_SYSTEM_PROMPT = """You are an expert X (Twitter) content creator.
+
+X POST REQUIREMENTS:
+- MAXIMUM 280 characters (STRICT LIMIT)
+- Strong, attention-grabbing opening
+- Concise and punchy
+- Clear value or insight
+- Conversational and authentic
+- 1-3 hashtags (included in character count)
+- Use line breaks for readability
+
+TONE: Confident, direct, engaging
+
+Create an X post. MUST be under 280 characters."""
+
+_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _SYSTEM_PROMPT}
+
 
 class XAgent:
     """
@@ -24,19 +42,53 @@ class XAgent:
     """
     
     platform: Platform = Platform.X
+    system_prompt: str = _SYSTEM_PROMPT
+    temperature: float = 0.7
+    max_tokens: int = 150
     MAX_LENGTH: int = 280
     
     def __init__(self):
         """Initialize X agent."""
-        self.openai = OpenAIService()
+        self.openai = get_openai_service()
     
-    async def create_post(self, prompt: str, history: list[MessageDict]) -> str:
+    def build_messages(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> tuple[MessageDict, ...]:
+        """Build the chat messages for a post request (history is pre-trimmed)."""
+        return (
+            _SYSTEM_MSG,
+            *history,
+            {"role": MessageRole.USER, "content": prompt},
+        )
+    
+    def finalize(self, post: str) -> str:
+        """
+        Enforce the X character limit.
+        
+        Length is counted in code points, which matches X's count for plain
+        text but undercounts its weighting of emoji and CJK characters.
+        """
+        if len(post) <= self.MAX_LENGTH:
+            return post
+        return self._truncate(post)
+    
+    @classmethod
+    def _truncate(cls, post: str) -> str:
+        """Cut an over-long post down to the limit, ending in an ellipsis."""
+        logger.warning(
+            "X post exceeds %d chars (%d), truncating", cls.MAX_LENGTH, len(post)
+        )
+        return post[:cls.MAX_LENGTH - 3] + "..."
+    
+    async def create_post(self, prompt: str, history: Sequence[MessageDict]) -> str:
         """
         Create an X post.
         
         Args:
             prompt: User's content request
-            history: Recent conversation history for context
+            history: Recent conversation history, already trimmed by the caller
             
         Returns:
             Generated X post (under 280 characters)
@@ -46,40 +98,20 @@ class XAgent:
         """
         logger.info("XAgent creating post")
         
-        system_prompt = """You are an expert X (Twitter) content creator.
-
-X POST REQUIREMENTS:
-- MAXIMUM 280 characters (STRICT LIMIT)
-- Strong, attention-grabbing opening
-- Concise and punchy
-- Clear value or insight
-- Conversational and authentic
-- 1-3 hashtags (included in character count)
-- Use line breaks for readability
-
-TONE: Confident, direct, engaging
-
-Create an X post. MUST be under 280 characters."""
-        
-        messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-3:],
-            {"role": "user", "content": prompt},
-        ]
+        messages = self.build_messages(prompt, history)
         
         try:
-            post = await self.openai.complete(messages, temperature=0.7, max_tokens=150)
-            
-            # Enforce character limit
-            if len(post) > self.MAX_LENGTH:
-                logger.warning(
-                    f"X post exceeds {self.MAX_LENGTH} chars ({len(post)}), truncating"
-                )
-                post = post[:self.MAX_LENGTH - 3] + "..."
+            post = await self.openai.complete(
+                messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                cache_key=f"agent:{self.platform.value}",
+            )
+            post = self.finalize(post)
             
-            logger.info(f"XAgent post created ({len(post)} chars)")
+            logger.info("XAgent post created (%d chars)", len(post))
             return post
             
-        except Exception as e:
-            logger.error(f"Error creating X post: {e}")
+        except Exception:
+            logger.exception("Error creating X post")
             raise
@@ -1,26 +1,13 @@
 """YouTube content generation agent."""
 
 import logging
-from app.types import MessageDict, Platform
-from app.services.openai_service import OpenAIService
+from collections.abc import Sequence
+from app.types import MessageDict, MessageRole, Platform
+from app.services.openai_service import get_openai_service
 
 logger = logging.getLogger(__name__)
 
-
-class YouTubeAgent:
-    """Generates YouTube-optimized titles and descriptions."""
-    
-    platform: Platform = Platform.YOUTUBE
-    
-    def __init__(self):
-        """Initialize YouTube agent."""
-        self.openai = OpenAIService()
-    
-    async def create_post(self, prompt: str, history: list[MessageDict]) -> str:
-        """Create YouTube title and description."""
-        logger.info("YouTubeAgent creating content")
-        
-        system_prompt = """You are an expert YouTube content creator.
+_SYSTEM_PROMPT = """You are an expert YouTube content creator.
 
 YOUTUBE CONTENT STRUCTURE:
 1. Title (60-70 characters, attention-grabbing, keyword-rich)
@@ -38,17 +25,55 @@ Format as:
 TONE: Enthusiastic, clear, SEO-conscious
 
 Create YouTube title and description."""
+
+_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _SYSTEM_PROMPT}
+
+
+class YouTubeAgent:
+    """Generates YouTube-optimized titles and descriptions."""
+    
+    platform: Platform = Platform.YOUTUBE
+    system_prompt: str = _SYSTEM_PROMPT
+    # SEO titles and descriptions don't need variety; low enough to be cached
+    temperature: float = 0.3
+    max_tokens: int = 800
+    
+    def __init__(self):
+        """Initialize YouTube agent."""
+        self.openai = get_openai_service()
+    
+    def build_messages(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> tuple[MessageDict, ...]:
+        """Build the chat messages for a post request (history is pre-trimmed)."""
+        return (
+            _SYSTEM_MSG,
+            *history,
+            {"role": MessageRole.USER, "content": prompt},
+        )
+    
+    def finalize(self, post: str) -> str:
+        """Return generated content unchanged; no post-processing needed."""
+        return post
+    
+    async def create_post(self, prompt: str, history: Sequence[MessageDict]) -> str:
+        """Create YouTube title and description."""
+        logger.info("YouTubeAgent creating content")
         
-        messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-3:],
-            {"role": "user", "content": prompt},
-        ]
+        messages = self.build_messages(prompt, history)
         
         try:
-            content = await self.openai.complete(messages, temperature=0.7, max_tokens=800)
+            content = await self.openai.complete(
+                messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                cache_key=f"agent:{self.platform.value}",
+            )
+            content = self.finalize(content)
             logger.info("YouTubeAgent content created")
             return content
-        except Exception as e:
-            logger.error(f"Error creating YouTube content: {e}")
+        except Exception:
+            logger.exception("Error creating YouTube content")
             raise
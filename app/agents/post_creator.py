@@ -3,10 +3,19 @@ Post Creator Agent - Orchestrates platform-specific content generation.
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Any
-from app.types import MessageDict, Platform
-from app.services.openai_service import OpenAIService
+from collections.abc import AsyncIterator, Awaitable, Sequence
+from functools import lru_cache
+from itertools import islice
+import orjson
+from app.types import CompletionRequest, MessageDict, MessageRole, Platform, PlatformAgent
+from app.config import get_settings
+from app.models.schemas import PostCreationResponse
+from app.services.openai_service import get_openai_service
+from app.services.request_coalescer import RequestCoalescer
+from app.services.response_cache import ResponseCache
+from app.services.semantic_cache import SemanticCache
 from app.agents.platform_agents.x_agent import XAgent
 from app.agents.platform_agents.linkedin_agent import LinkedInAgent
 from app.agents.platform_agents.instagram_agent import InstagramAgent
@@ -14,6 +23,83 @@ from app.agents.platform_agents.youtube_agent import YouTubeAgent
 from app.agents.platform_agents.school_agent import SchoolAgent
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Number of recent messages platform agents see as context
+HISTORY_WINDOW = 3
+
+_response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+# Identical requests already being generated, shared whatever the temperature
+_pending_posts: RequestCoalescer[str] = RequestCoalescer()
+
+_semantic_cache: SemanticCache | None = (
+    SemanticCache(
+        dimensions=settings.SEMANTIC_CACHE_DIMENSIONS,
+        maxsize=settings.SEMANTIC_CACHE_MAX_SIZE,
+        ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    )
+    if settings.SEMANTIC_CACHE_ENABLED
+    else None
+)
+
+# Platform names as shown to the user, keyed like the platform agents
+_DISPLAY_NAMES: dict[str, str] = {
+    "x": "X",
+    "twitter": "X",
+    "linkedin": "LinkedIn",
+    "instagram": "Instagram",
+    "youtube": "YouTube",
+    "school": "School",
+}
+
+# Response when no platform is detected.
+_NO_PLATFORM_RESPONSE = (
+    "📝 I can create posts for multiple platforms!\n\n"
+    "Which platform(s) would you like?\n"
+    "• X (Twitter)\n"
+    "• LinkedIn\n"
+    "• Instagram\n"
+    "• YouTube\n"
+    "• School\n\n"
+    "Example: 'Create a LinkedIn post about AI automation'"
+)
+
+
+def _response_cache_key(platform: str, prompt: str, history: Sequence[MessageDict]) -> str:
+    """Build the response cache key for a platform request (trimmed history)."""
+    tail = "".join(m["content"] for m in history)
+    return hashlib.blake2b(
+        f"{platform}|{prompt}|{tail}".encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def _semantic_cache_scope(platform: str, history: Sequence[MessageDict]) -> str:
+    """Build the semantic cache scope: same platform and recent context."""
+    return _response_cache_key(platform, "", history)
+
+
+@lru_cache
+def get_platform_agents() -> dict[str, PlatformAgent]:
+    """
+    Get the shared platform agents, keyed by platform name.
+    
+    Agents are stateless, so they are built once and reused by every
+    PostCreatorAgent instead of once per conversation.
+    """
+    x_agent = XAgent()
+    return {
+        "x": x_agent,
+        "twitter": x_agent,  # Alias
+        "linkedin": LinkedInAgent(),
+        "instagram": InstagramAgent(),
+        "youtube": YouTubeAgent(),
+        "school": SchoolAgent(),
+    }
 
 
 class PostCreatorAgent:
@@ -25,22 +111,17 @@ class PostCreatorAgent:
     
     def __init__(self):
         """Initialize Post Creator agent."""
-        self.openai = OpenAIService()
-        
-        # Initialize all platform agents
-        self.agents: dict[str, Any] = {
-            "x": XAgent(),
-            "twitter": XAgent(),  # Alias
-            "linkedin": LinkedInAgent(),
-            "instagram": InstagramAgent(),
-            "youtube": YouTubeAgent(),
-            "school": SchoolAgent(),
-        }
+        self.openai = get_openai_service()
+        
+        # Platform agents are shared across all conversations
+        self.agents = get_platform_agents()
     
     async def create_posts(
         self,
         prompt: str,
-        history: list[MessageDict],
+        history: Sequence[MessageDict],
+        regenerate: bool = False,
+        platforms: list[str] | None = None,
     ) -> str:
         """
         Create social media posts for requested platforms.
@@ -48,58 +129,373 @@ class PostCreatorAgent:
         Args:
             prompt: User's content request
             history: Conversation history for context
-            
+            regenerate: Bypass cached posts and generate fresh ones
+            platforms: Platforms already detected by the caller; detected from
+                the prompt when None
+                
         Returns:
             Formatted response with all generated posts
         """
+        return "".join([
+            part async for part in self.stream_posts(
+                prompt, history, regenerate, platforms
+            )
+        ])
+    
+    async def stream_posts(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+        regenerate: bool = False,
+        platforms: list[str] | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Create social media posts, yielding each one as soon as it is ready.
+        
+        The header is yielded immediately, then one block per platform in
+        completion order, so the fastest agent is shown first.
+        
+        With FUSED_POST_GENERATION enabled, requests for two or more platforms
+        are generated in one combined completion instead.
+        
+        Args:
+            prompt: User's content request
+            history: Conversation history for context
+            regenerate: Bypass cached posts and generate fresh ones
+            platforms: Platforms already detected by the caller; detected from
+                the prompt when None
+                
+        Yields:
+            Response parts; their concatenation is the full response
+        """
         logger.info("PostCreator processing request")
         
-        # Detect platforms
-        platforms = await self.openai.detect_platforms(prompt)
+        # Trim once here; every agent shares the same window
+        history = tuple(islice(history, max(len(history) - HISTORY_WINDOW, 0), None))
+        
+        # Detect platforms unless the caller already did
+        if platforms is None:
+            platforms = await self.openai.detect_platforms(prompt)
         
         if not platforms:
-            return self._no_platform_response()
+            yield _NO_PLATFORM_RESPONSE
+            return
         
-        logger.info(f"Creating posts for platforms: {platforms}")
+        logger.info("Creating posts for platforms: %s", platforms)
         
-        # Create posts in parallel
-        tasks = []
-        platform_names = []
+        selected: list[tuple[str, str, PlatformAgent]] = []
+        for platform in platforms:
+            key = platform.lower()
+            agent = self.agents.get(key)
+            if agent:
+                selected.append((_DISPLAY_NAMES[key], platform, agent))
+        
+        use_fused = settings.FUSED_POST_GENERATION and len(selected) >= 2
+        
+        # Start generations before yielding so they run meanwhile
+        tasks = [] if use_fused else self._start_posts(selected, prompt, history, regenerate)
+        
+        try:
+            yield "✨ **Generated Posts**\n"
+            
+            if use_fused:
+                try:
+                    results = await self._create_posts_fused(selected, prompt, history)
+                except Exception as e:
+                    logger.warning("Fused generation failed, falling back to parallel: %s", e)
+                    tasks = self._start_posts(selected, prompt, history, regenerate)
+                else:
+                    for platform_name, result in results:
+                        yield self._format_post(platform_name, result)
+                    return
+            
+            for next_done in asyncio.as_completed(tasks):
+                platform_name, result = await next_done
+                yield self._format_post(platform_name, result)
+        finally:
+            # Consumer stopped early (even at the header); don't leave generations running
+            for task in tasks:
+                task.cancel()
+    
+    async def generate_posts(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+        platforms: list[str],
+        regenerate: bool = False,
+        batch: bool = False,
+    ) -> PostCreationResponse:
+        """
+        Create posts for the given platforms as structured results.
+        
+        All platforms are generated concurrently, so the total time is that
+        of the slowest platform rather than the sum of all of them.
         
+        With batch=True and two or more platforms, all posts are generated in
+        a single Batch API job at half the cost but much higher latency. If the
+        batch fails or times out, generation falls back to parallel requests.
+        
+        Args:
+            prompt: User's content request
+            history: Conversation history for context
+            platforms: Platforms to create posts for; unknown names are ignored
+            regenerate: Bypass cached posts and generate fresh ones
+            batch: Generate through the Batch API (non-interactive callers)
+            
+        Returns:
+            Generated posts and error messages, keyed by platform
+        """
+        history = tuple(islice(history, max(len(history) - HISTORY_WINDOW, 0), None))
+        
+        # Aliases share an agent, so each platform is generated once
+        selected: dict[Platform, tuple[str, PlatformAgent]] = {}
         for platform in platforms:
             agent = self.agents.get(platform.lower())
             if agent:
-                tasks.append(agent.create_post(prompt, history))
-                # Normalize platform name for display
-                display_name = "X" if platform.lower() in ["x", "twitter"] else platform.title()
-                platform_names.append(display_name)
-        
-        # Execute all tasks concurrently
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Format response
-        response_parts = ["✨ **Generated Posts**\n"]
-        
-        for platform_name, result in zip(platform_names, results):
-            if isinstance(result, Exception):
-                logger.error(f"Error generating {platform_name} post: {result}")
-                response_parts.append(
-                    f"\n❌ **{platform_name}**: Error generating post\n"
+                selected.setdefault(agent.platform, (platform, agent))
+        
+        results: list[str | BaseException] | None = None
+        if batch and len(selected) >= 2:
+            try:
+                batched = await self._create_posts_batched(
+                    [(key.value, platform, agent) for key, (platform, agent) in selected.items()],
+                    prompt,
+                    history,
                 )
+            except Exception as e:
+                logger.warning("Batch generation failed, falling back to parallel: %s", e)
+            else:
+                results = [result for _, result in batched]
+        
+        if results is None:
+            results = await asyncio.gather(
+                *(
+                    self._create_post_shared(agent, platform, prompt, history, regenerate)
+                    for platform, agent in selected.values()
+                ),
+                return_exceptions=True,
+            )
+        
+        posts: dict[Platform, str] = {}
+        errors: dict[Platform, str] = {}
+        for key, result in zip(selected, results):
+            if isinstance(result, BaseException):
+                logger.error("Error generating %s post: %s", key.value, result)
+                errors[key] = str(result)
             else:
-                response_parts.append(f"\n📱 **{platform_name}**\n{result}\n")
+                posts[key] = result
         
-        return "\n".join(response_parts)
+        return PostCreationResponse(posts=posts, errors=errors)
     
-    def _no_platform_response(self) -> str:
-        """Return response when no platform is detected."""
-        return (
-            "📝 I can create posts for multiple platforms!\n\n"
-            "Which platform(s) would you like?\n"
-            "• X (Twitter)\n"
-            "• LinkedIn\n"
-            "• Instagram\n"
-            "• YouTube\n"
-            "• School\n\n"
-            "Example: 'Create a LinkedIn post about AI automation'"
+    def _start_posts(
+        self,
+        selected: list[tuple[str, str, PlatformAgent]],
+        prompt: str,
+        history: Sequence[MessageDict],
+        regenerate: bool,
+    ) -> list[asyncio.Task[tuple[str, str | Exception]]]:
+        """Start one labelled generation task per selected platform."""
+        tasks = []
+        for display_name, platform, agent in selected:
+            post = self._create_post_shared(agent, platform, prompt, history, regenerate)
+            tasks.append(asyncio.ensure_future(self._labelled(display_name, post)))
+        return tasks
+    
+    async def _create_posts_batched(
+        self,
+        selected: list[tuple[str, str, PlatformAgent]],
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> list[tuple[str, str | Exception]]:
+        """Generate all selected posts in a single Batch API job."""
+        requests: list[CompletionRequest] = [
+            {
+                "messages": agent.build_messages(prompt, history),
+                "temperature": agent.temperature,
+                "max_tokens": agent.max_tokens,
+            }
+            for _, _, agent in selected
+        ]
+        
+        outputs = await self.openai.complete_batch(
+            requests,
+            timeout=settings.REQUEST_TIMEOUT_SECONDS,
         )
+        
+        return [
+            (
+                display_name,
+                agent.finalize(output)
+                if output is not None
+                else RuntimeError("Batch request failed"),
+            )
+            for (display_name, _, agent), output in zip(selected, outputs)
+        ]
+    
+    async def _create_posts_fused(
+        self,
+        selected: list[tuple[str, str, PlatformAgent]],
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> list[tuple[str, str | Exception]]:
+        """
+        Generate all selected posts in one completion.
+        
+        The platform system prompts are combined into a single prompt that
+        asks for a JSON object keyed by platform, so the shared prefix and
+        round-trip are paid once instead of once per platform.
+        """
+        agents: dict[str, PlatformAgent] = {}
+        for _, _, agent in selected:
+            agents.setdefault(agent.platform.value, agent)
+        
+        sections = "\n\n".join(
+            f"## {key}\n{agent.system_prompt}" for key, agent in agents.items()
+        )
+        example = orjson.dumps({key: "..." for key in agents}).decode()
+        system_prompt = (
+            "You write social media posts for several platforms at once. "
+            "Follow each platform's guidelines below for its post.\n\n"
+            f"{sections}\n\n"
+            f"Respond with a JSON object with exactly these keys: {example}\n"
+            "Each value is the finished post for that platform."
+        )
+        
+        messages: list[MessageDict] = [
+            {"role": MessageRole.SYSTEM, "content": system_prompt},
+            *history,
+            {"role": MessageRole.USER, "content": prompt},
+        ]
+        
+        output = orjson.loads(
+            await self.openai.complete(
+                messages,
+                temperature=max(agent.temperature for agent in agents.values()),
+                max_tokens=sum(agent.max_tokens for agent in agents.values()),
+                json_mode=True,
+            )
+        )
+        
+        results: list[tuple[str, str | Exception]] = []
+        for display_name, _, agent in selected:
+            post = output.get(agent.platform.value)
+            if isinstance(post, str) and post.strip():
+                results.append((display_name, agent.finalize(post.strip())))
+            else:
+                results.append((display_name, RuntimeError("Missing from fused response")))
+        return results
+    
+    @staticmethod
+    def _format_post(platform_name: str, result: str | Exception) -> str:
+        """Format one platform's post (or error) as a response block."""
+        if isinstance(result, Exception):
+            logger.error("Error generating %s post: %s", platform_name, result)
+            return f"\n\n❌ **{platform_name}**: Error generating post\n"
+        return f"\n\n📱 **{platform_name}**\n{result}\n"
+    
+    @staticmethod
+    async def _labelled(
+        platform_name: str,
+        post: Awaitable[str],
+    ) -> tuple[str, str | Exception]:
+        """Await a platform post, pairing the result or error with its name."""
+        try:
+            return platform_name, await post
+        except Exception as e:
+            return platform_name, e
+    
+    async def _create_post_shared(
+        self,
+        agent: PlatformAgent,
+        platform: str,
+        prompt: str,
+        history: Sequence[MessageDict],
+        regenerate: bool,
+    ) -> str:
+        """
+        Create a post, joining an identical request already in flight.
+        
+        Duplicate submissions arriving while the first is still generating
+        share its post instead of paying for another completion. Regenerate
+        requests always start their own generation.
+        """
+        key = _response_cache_key(platform, prompt, history)
+        if regenerate:
+            return await self._create_post_cached(agent, platform, key, prompt, history, True)
+        
+        return await _pending_posts.run(
+            key,
+            lambda: self._create_post_cached(agent, platform, key, prompt, history, False),
+        )
+    
+    async def _create_post_cached(
+        self,
+        agent: PlatformAgent,
+        platform: str,
+        key: str,
+        prompt: str,
+        history: Sequence[MessageDict],
+        regenerate: bool,
+    ) -> str:
+        """
+        Create a post through the response cache.
+        
+        Identical requests within the cache TTL are served without calling
+        the agent. With SEMANTIC_CACHE_ENABLED, paraphrased requests are
+        served too. Agents sampling above RESPONSE_CACHE_MAX_TEMPERATURE are
+        never cached.
+        """
+        if agent.temperature > settings.RESPONSE_CACHE_MAX_TEMPERATURE:
+            return await agent.create_post(prompt, history)
+        
+        if not regenerate:
+            cached = _response_cache.get(key)
+            if cached is not None:
+                logger.info("Response cache hit for %s", platform)
+                return cached
+        
+        embedding: list[float] | None = None
+        semantic_cache = _semantic_cache
+        if semantic_cache is not None:
+            scope = _semantic_cache_scope(platform, history)
+            try:
+                embedding = await self.openai.embed(prompt)
+            except Exception:
+                logger.warning("Prompt embedding failed, skipping semantic cache", exc_info=True)
+            
+            if embedding is not None and not regenerate:
+                cached = await self._semantic_cache_get(semantic_cache, scope, embedding, prompt)
+                if cached is not None:
+                    logger.info("Semantic cache hit for %s", platform)
+                    _response_cache.set(key, cached)
+                    return cached
+        
+        post = await agent.create_post(prompt, history)
+        _response_cache.set(key, post)
+        if semantic_cache is not None and embedding is not None:
+            semantic_cache.add(scope, embedding, prompt, post)
+        return post
+    
+    async def _semantic_cache_get(
+        self,
+        semantic_cache: SemanticCache,
+        scope: str,
+        embedding: list[float],
+        prompt: str,
+    ) -> str | None:
+        """
+        Look up a post cached for a semantically equivalent prompt.
+        
+        Matches above SEMANTIC_CACHE_HIT_THRESHOLD are served directly.
+        Matches between the verify and hit thresholds are only served if a
+        cheap comparison call confirms both prompts ask for the same post.
+        """
+        match = semantic_cache.lookup(scope, embedding)
+        if match is None or match.similarity <= settings.SEMANTIC_CACHE_VERIFY_THRESHOLD:
+            return None
+        
+        if match.similarity <= settings.SEMANTIC_CACHE_HIT_THRESHOLD:
+            if not await self.openai.is_same_request(match.prompt, prompt):
+                return None
+        
+        return match.response
@@ -4,16 +4,93 @@ Super Agent - Main orchestrator for the AI Social Media System.
 Handles intent analysis, routing, and coordination between sub-agents.
 """
 
+import asyncio
 import logging
-from app.types import MessageDict, ConversationID
+import re
+from collections import deque
+from collections.abc import AsyncIterator, Sequence
+from itertools import islice
+from sqlalchemy import select
+from app.types import MessageDict, MessageRole, ConversationID
 from app.models.database import DatabaseManager, Message
-from app.services.openai_service import OpenAIService
+from app.services.openai_service import get_openai_service
 from app.agents.post_creator import PostCreatorAgent
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+_GENERAL_SYSTEM_PROMPT = """You are a helpful AI assistant for a social media automation system.
+
+You help users create social media content and edit images. Be friendly and guide them
+on how to use the system effectively.
+
+Your capabilities:
+- Create posts for X (Twitter), LinkedIn, Instagram, YouTube, and School
+- Edit images with AI (coming soon)
+- Generate multi-platform content simultaneously
+
+Keep responses concise and helpful."""
+
+_GENERAL_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _GENERAL_SYSTEM_PROMPT}
+
+# Words that name a platform unambiguously; a bare "X" is too common to match
+_PLATFORM_KEYWORDS: dict[str, str] = {
+    "linkedin": "linkedin",
+    "instagram": "instagram",
+    "youtube": "youtube",
+    "twitter": "x",
+    "tweet": "x",
+    "tweets": "x",
+    "x post": "x",
+    "x posts": "x",
+}
+
+_PLATFORM_KEYWORD_RE = re.compile(
+    r"\b(%s)\b" % "|".join(map(re.escape, _PLATFORM_KEYWORDS)),
+    re.IGNORECASE,
+)
+
+# Response when user wants to edit image but hasn't uploaded one.
+_IMAGE_UPLOAD_REQUIRED_RESPONSE = (
+    "📸 To edit an image, please upload an image along with your instructions.\n\n"
+    "For example, upload a photo and add a caption like:\n"
+    "• 'Change the text to Hello World'\n"
+    "• 'Make the background blue'\n"
+    "• 'Add a second dog to this image'"
+)
+
+# Response when /regenerate is used before any request was made.
+_NOTHING_TO_REGENERATE_RESPONSE = (
+    "🔄 There's nothing to regenerate yet.\n\n"
+    "Send me a request first, e.g. 'Create a LinkedIn post about AI automation'"
+)
+
+# Response when image uploaded without instructions.
+_IMAGE_INSTRUCTIONS_REQUIRED_RESPONSE = (
+    "📸 I received your image! What would you like me to do with it?\n\n"
+    "You can:\n"
+    "• Edit the image: 'Change the text to...', 'Make the background blue'\n"
+    "• Create a post: 'Write a LinkedIn post about this image'\n"
+    "• Both: 'Add a logo and create an Instagram post'"
+)
+
+# Response when image editing is requested but not configured.
+_IMAGE_EDITING_NOT_AVAILABLE_RESPONSE = (
+    "🎨 Image editing requires additional configuration.\n\n"
+    "To enable image editing, please configure:\n"
+    "• IMAGEBB_API_KEY\n"
+    "• REPLICATE_API_TOKEN\n\n"
+    "I can still help you create posts about your image!"
+)
+
+
+def _keyword_platforms(prompt: str) -> list[str]:
+    """Platforms named by keyword in a prompt, in order of first mention."""
+    return list(dict.fromkeys(
+        _PLATFORM_KEYWORDS[match.lower()] for match in _PLATFORM_KEYWORD_RE.findall(prompt)
+    ))
+
 
 class SuperAgent:
     """
@@ -36,35 +113,103 @@ class SuperAgent:
         """
         self.conversation_id = conversation_id
         self.db_manager = db_manager
-        self.openai = OpenAIService()
+        self.openai = get_openai_service()
         self.post_creator = PostCreatorAgent()
+        
+        # Recent history, loaded once and kept current by record_message
+        self._history: deque[MessageDict] | None = None
     
-    async def process_text(self, text: str) -> str:
+    async def process_text(self, text: str, regenerate: bool = False) -> str:
         """
         Process a text-only message.
         
         Args:
             text: User's text input
+            regenerate: Bypass cached posts and generate fresh ones
             
         Returns:
             Response text
         """
-        logger.info(f"SuperAgent processing text for conversation {self.conversation_id}")
+        return "".join([chunk async for chunk in self.stream_text(text, regenerate)])
+    
+    async def stream_text(self, text: str, regenerate: bool = False) -> AsyncIterator[str]:
+        """
+        Process a text-only message, yielding the response as it is generated.
+        
+        With KEYWORD_PLATFORM_DETECTION enabled, a message naming a platform
+        by keyword is routed straight to post creation without a classifier
+        call.
+        
+        Args:
+            text: User's text input
+            regenerate: Bypass cached posts and generate fresh ones
+            
+        Yields:
+            Response text chunks; their concatenation is the full response
+        """
+        logger.info("SuperAgent processing text for conversation %s", self.conversation_id)
         
         # Get conversation history
-        history = self._get_conversation_history()
+        history = await self._load_history()
+        
+        async for chunk in self._stream_request(text, history, regenerate):
+            yield chunk
+    
+    async def stream_regenerate(self) -> AsyncIterator[str]:
+        """
+        Repeat the user's latest request, bypassing cached posts.
         
-        # Analyze intent
-        intent = await self.openai.analyze_intent(text, history)
-        logger.info(f"Detected intent: {intent}")
+        The request is replayed against the history before it, so the model
+        sees it once and not the reply being replaced.
+        
+        Yields:
+            Response text chunks; their concatenation is the full response
+        """
+        history = await self._load_history()
+        last = next(
+            (i for i in reversed(range(len(history))) if history[i]["role"] == MessageRole.USER),
+            None,
+        )
+        if last is None:
+            yield _NOTHING_TO_REGENERATE_RESPONSE
+            return
+        
+        earlier = tuple(islice(history, last))
+        async for chunk in self._stream_request(history[last]["content"], earlier, True):
+            yield chunk
+    
+    async def _stream_request(
+        self,
+        text: str,
+        history: Sequence[MessageDict],
+        regenerate: bool,
+    ) -> AsyncIterator[str]:
+        """Classify a text request and stream the reply from the matching handler."""
+        # Messages naming a platform are post requests; skip the classifier
+        keyword_platforms = (
+            _keyword_platforms(text) if settings.KEYWORD_PLATFORM_DETECTION else []
+        )
+        if keyword_platforms:
+            intent, platforms = "create_post", keyword_platforms
+        else:
+            # Analyze intent and target platforms in one call
+            classification = await self.openai.classify_request(text, history)
+            intent = classification["intent"]
+            platforms = classification["platforms"]
+        logger.info("Detected intent: %s", intent)
         
         # Route based on intent
-        if intent == "create_post":
-            return await self.post_creator.create_posts(text, history)
+        if intent in ("create_post", "schedule_post"):
+            # The user is waiting on this chat reply, so never use the Batch API
+            async for part in self.post_creator.stream_posts(
+                text, history, regenerate, platforms=platforms
+            ):
+                yield part
         elif intent == "edit_image":
-            return self._image_upload_required_response()
+            yield _IMAGE_UPLOAD_REQUIRED_RESPONSE
         else:
-            return await self._handle_general_conversation(text, history)
+            async for chunk in self._stream_general_conversation(text, history):
+                yield chunk
     
     async def process_image(self, image_path: str, caption: str) -> str:
         """
@@ -77,31 +222,72 @@ class SuperAgent:
         Returns:
             Response text
         """
-        logger.info(f"SuperAgent processing image for conversation {self.conversation_id}")
+        return "".join([chunk async for chunk in self.stream_image(image_path, caption)])
+    
+    async def stream_image(self, image_path: str, caption: str) -> AsyncIterator[str]:
+        """
+        Process an image with optional caption, yielding the response as it is generated.
+        
+        Args:
+            image_path: Path to the downloaded image
+            caption: User's caption/instructions
+            
+        Yields:
+            Response text chunks; their concatenation is the full response
+        """
+        logger.info("SuperAgent processing image for conversation %s", self.conversation_id)
         
         if not caption:
-            return self._image_instructions_required_response()
+            yield _IMAGE_INSTRUCTIONS_REQUIRED_RESPONSE
+            return
         
         # Get conversation history
-        history = self._get_conversation_history()
+        history = await self._load_history()
         
-        # Analyze image intent
-        intent = await self.openai.analyze_image_intent(caption)
-        logger.info(f"Detected image intent: {intent}")
+        # Analyze image intent and target platforms in one call
+        classification = await self.openai.classify_image_request(caption)
+        intent = classification["image_intent"]
+        logger.info("Detected image intent: %s", intent)
         
-        if intent == "edit_only":
-            # Image editing not implemented in this phase
-            return self._image_editing_not_available_response()
-        elif intent == "post_only":
+        if intent == "post_only":
             context = f"User uploaded an image and wants: {caption}"
-            return await self.post_creator.create_posts(context, history)
-        else:  # "both"
-            return self._image_editing_not_available_response()
+            async for part in self.post_creator.stream_posts(
+                context, history, platforms=classification["platforms"]
+            ):
+                yield part
+        else:  # "edit_only" or "both"
+            # Image editing not implemented in this phase
+            yield _IMAGE_EDITING_NOT_AVAILABLE_RESPONSE
+    
+    def record_message(self, role: MessageRole, content: str) -> None:
+        """
+        Add a newly saved message to the cached conversation history.
+        
+        Args:
+            role: Role of the message author
+            content: Message text
+        """
+        if self._history is not None:
+            self._history.append({"role": role, "content": content})
+    
+    async def _load_history(self) -> Sequence[MessageDict]:
+        """
+        Get recent conversation history without blocking the event loop.
+        
+        The database is queried in a worker thread on first use only; after
+        that the cached copy is returned.
+        
+        Returns:
+            List of messages in chronological order
+        """
+        if self._history is None:
+            self._history = await asyncio.to_thread(self._get_conversation_history)
+        return self._history
     
     def _get_conversation_history(
         self,
         limit: int | None = None,
-    ) -> list[MessageDict]:
+    ) -> deque[MessageDict]:
         """
         Get recent conversation history.
         
@@ -116,81 +302,57 @@ class SuperAgent:
         
         session = self.db_manager.get_session()
         try:
-            messages = (
-                session.query(Message)
-                .filter(Message.conversation_id == self.conversation_id)
-                .order_by(Message.created_at.desc())
+            # Only the two columns needed, as plain rows in a single query
+            rows = session.execute(
+                select(Message.role, Message.content)
+                .where(Message.conversation_id == self.conversation_id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
                 .limit(limit)
-                .all()
-            )
+            ).all()
             
-            # Reverse to get chronological order
-            history: list[MessageDict] = [
-                {"role": msg.role, "content": msg.content}  # type: ignore
-                for msg in reversed(messages)
-            ]
+            # Reverse to get chronological order, bounded to the limit
+            history: deque[MessageDict] = deque(
+                (
+                    {"role": role, "content": content}  # type: ignore
+                    for role, content in reversed(rows)
+                ),
+                maxlen=limit,
+            )
             
             return history
             
         finally:
             session.close()
     
-    async def _handle_general_conversation(
+    async def _stream_general_conversation(
         self,
         text: str,
-        history: list[MessageDict],
-    ) -> str:
-        """Handle general conversation."""
-        system_prompt = """You are a helpful AI assistant for a social media automation system.
-
-You help users create social media content and edit images. Be friendly and guide them
-on how to use the system effectively.
-
-Your capabilities:
-- Create posts for X (Twitter), LinkedIn, Instagram, YouTube, and School
-- Edit images with AI (coming soon)
-- Generate multi-platform content simultaneously
-
-Keep responses concise and helpful."""
+        history: Sequence[MessageDict],
+    ) -> AsyncIterator[str]:
+        """
+        Handle general conversation, streaming the reply.
         
+        A failure before the first chunk becomes an apology; a failure after
+        it is raised, so the caller can report it separately.
+        """
         messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-5:],
-            {"role": "user", "content": text},
+            _GENERAL_SYSTEM_MSG,
+            *islice(history, max(len(history) - 5, 0), None),
+            {"role": MessageRole.USER, "content": text},
         ]
         
+        started = False
         try:
-            return await self.openai.complete(messages, temperature=0.7, max_tokens=500)
-        except Exception as e:
-            logger.error(f"Error in general conversation: {e}")
-            return "I'm sorry, I encountered an error. Please try again."
-    
-    def _image_upload_required_response(self) -> str:
-        """Response when user wants to edit image but hasn't uploaded one."""
-        return (
-            "📸 To edit an image, please upload an image along with your instructions.\n\n"
-            "For example, upload a photo and add a caption like:\n"
-            "• 'Change the text to Hello World'\n"
-            "• 'Make the background blue'\n"
-            "• 'Add a second dog to this image'"
-        )
-    
-    def _image_instructions_required_response(self) -> str:
-        """Response when image uploaded without instructions."""
-        return (
-            "📸 I received your image! What would you like me to do with it?\n\n"
-            "You can:\n"
-            "• Edit the image: 'Change the text to...', 'Make the background blue'\n"
-            "• Create a post: 'Write a LinkedIn post about this image'\n"
-            "• Both: 'Add a logo and create an Instagram post'"
-        )
-    
-    def _image_editing_not_available_response(self) -> str:
-        """Response when image editing is requested but not configured."""
-        return (
-            "🎨 Image editing requires additional configuration.\n\n"
-            "To enable image editing, please configure:\n"
-            "• IMAGEBB_API_KEY\n"
-            "• REPLICATE_API_TOKEN\n\n"
-            "I can still help you create posts about your image!"
-        )
+            async for chunk in self.openai.stream_complete(
+                messages,
+                temperature=0.7,
+                max_tokens=500,
+            ):
+                started = True
+                yield chunk
+        except Exception:
+            if started:
+                # Part of the reply is already shown; an apology can't follow it
+                raise
+            logger.exception("Error in general conversation")
+            yield "I'm sorry, I encountered an error. Please try again."
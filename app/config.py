@@ -11,6 +11,23 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from app.types import LogLevel, UserID
 
 
+@lru_cache(maxsize=1)
+def _parse_user_ids(raw: str) -> tuple[UserID, ...]:
+    """
+    Parse a comma-separated list of Telegram user IDs.
+    
+    Settings are frozen, so the raw value never changes and the parsed
+    tuple can be memoized instead of re-parsed on every authorization check.
+    """
+    if not raw.strip():
+        return ()
+    
+    try:
+        return tuple(int(uid) for uid in raw.split(",") if uid.strip())
+    except ValueError as e:
+        raise ValueError(f"Invalid user ID in TELEGRAM_ALLOWED_USER_IDS: {e}")
+
+
 class Settings(BaseSettings):
     """Application settings with validation."""
     
@@ -34,6 +51,7 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_API_KEY: str = Field(default="test_key_12345678901234567890", min_length=20)
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
+    OPENAI_CLASSIFIER_MODEL: str = "gpt-4o-mini"
     OPENAI_TEMPERATURE: float = Field(default=0.7, ge=0.0, le=2.0)
     OPENAI_MAX_TOKENS: int = Field(default=800, ge=1, le=4000)
     
@@ -62,6 +80,36 @@ class Settings(BaseSettings):
     REQUEST_TIMEOUT_SECONDS: int = Field(default=300, ge=30, le=600)
     MAX_CONVERSATION_HISTORY: int = Field(default=10, ge=1, le=50)
     
+    # Generate multi-platform requests in one fused call instead of one per platform
+    FUSED_POST_GENERATION: bool = False
+    
+    # Treat messages naming a platform by keyword as post requests, skipping the classifier
+    KEYWORD_PLATFORM_DETECTION: bool = False
+    
+    # Response caching
+    RESPONSE_CACHE_TTL_SECONDS: int = Field(default=3600, ge=0)
+    RESPONSE_CACHE_MAX_SIZE: int = Field(default=1024, ge=1)
+    RESPONSE_CACHE_MAX_TEMPERATURE: float = Field(default=0.3, ge=0.0, le=2.0)
+    
+    # Semantic caching (optional; matches paraphrased prompts by embedding)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    SEMANTIC_CACHE_DIMENSIONS: int = Field(default=128, ge=1)
+    SEMANTIC_CACHE_MAX_SIZE: int = Field(default=1024, ge=1)
+    SEMANTIC_CACHE_HIT_THRESHOLD: float = Field(default=0.95, ge=0.0, le=1.0)
+    SEMANTIC_CACHE_VERIFY_THRESHOLD: float = Field(default=0.85, ge=0.0, le=1.0)
+    
+    # Classifier caching (intent and platform detection results)
+    CLASSIFIER_CACHE_MAX_SIZE: int = Field(default=4096, ge=1)
+    # Also reuse intent labels for paraphrased inputs (never platform lists)
+    CLASSIFIER_SEMANTIC_CACHE_ENABLED: bool = False
+    CLASSIFIER_CACHE_SIMILARITY_THRESHOLD: float = Field(default=0.92, ge=0.0, le=1.0)
+    
+    # Classifier batching (coalesces concurrent classify_request calls)
+    CLASSIFIER_BATCHING_ENABLED: bool = False
+    CLASSIFIER_BATCH_MAX_SIZE: int = Field(default=16, ge=1)
+    CLASSIFIER_BATCH_MAX_WAIT_MS: int = Field(default=25, ge=1)
+    
     @field_validator("TELEGRAM_BOT_TOKEN")
     @classmethod
     def validate_telegram_token(cls, v: str) -> str:
@@ -71,19 +119,9 @@ class Settings(BaseSettings):
         return v
     
     @property
-    def allowed_user_ids(self) -> list[UserID]:
-        """Parse and return list of allowed user IDs."""
-        if not self.TELEGRAM_ALLOWED_USER_IDS.strip():
-            return []
-        
-        try:
-            return [
-                int(uid.strip())
-                for uid in self.TELEGRAM_ALLOWED_USER_IDS.split(",")
-                if uid.strip()
-            ]
-        except ValueError as e:
-            raise ValueError(f"Invalid user ID in TELEGRAM_ALLOWED_USER_IDS: {e}")
+    def allowed_user_ids(self) -> tuple[UserID, ...]:
+        """Parse and return allowed user IDs (parsed once per distinct value)."""
+        return _parse_user_ids(self.TELEGRAM_ALLOWED_USER_IDS)
     
     @property
     def is_user_whitelist_enabled(self) -> bool:
@@ -4,13 +4,21 @@ Main application entry point.
 Manages application lifecycle, database initialization, and bot startup.
 """
 
+import asyncio
 import logging
 import sys
 from contextlib import asynccontextmanager
+import pydantic
+import pydantic_core
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from app.agents.post_creator import PostCreatorAgent
 from app.config import get_settings
 from app.models.database import DatabaseManager
+from app.models.schemas import PostCreationRequest, PostCreationResponse
+from app.services.openai_service import get_openai_service
 from app.telegram.bot import TelegramBot
+from app.types import MessageDict
 
 # Configure logging
 settings = get_settings()
@@ -36,8 +44,12 @@ async def lifespan(app: FastAPI):
     
     # Startup
     logger.info("Starting AI Social Media System...")
-    logger.info(f"Debug mode: {settings.DEBUG}")
-    logger.info(f"User whitelist enabled: {settings.is_user_whitelist_enabled}")
+    logger.info("Debug mode: %s", settings.DEBUG)
+    logger.info("User whitelist enabled: %s", settings.is_user_whitelist_enabled)
+    logger.info(
+        "pydantic %s (pydantic-core %s)", pydantic.VERSION, pydantic_core.__version__
+    )
+    logger.info("Event loop: %s", type(asyncio.get_running_loop()).__module__)
     
     # Initialize database
     db_manager = DatabaseManager(settings.DATABASE_URL, echo=settings.DEBUG)
@@ -57,6 +69,7 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down AI Social Media System...")
     if telegram_bot:
         await telegram_bot.stop()
+    await get_openai_service().close()
     logger.info("Shutdown complete")
 
 
@@ -65,6 +78,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -88,6 +102,21 @@ async def health():
     }
 
 
+
+@app.post("/posts")
+async def create_posts(request: PostCreationRequest) -> PostCreationResponse:
+    """Generate posts for the requested platforms, reporting failures per platform."""
+    history: list[MessageDict] = [
+        {"role": message.role, "content": message.content} for message in request.history
+    ]
+    return await PostCreatorAgent().generate_posts(
+        request.prompt,
+        history,
+        [platform.value for platform in request.platforms],
+        batch=request.batch,
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -96,5 +125,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.DEBUG,
+        # Uses uvloop (installed with uvicorn[standard]) where available
+        loop="auto",
         log_level=settings.LOG_LEVEL.lower(),
     )
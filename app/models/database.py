@@ -4,6 +4,7 @@ Database models using SQLAlchemy ORM.
 All models are strictly typed and include proper relationships.
 """
 
+import logging
 from datetime import datetime
 from typing import TYPE_CHECKING
 from sqlalchemy import (
@@ -13,7 +14,15 @@ from sqlalchemy import (
     Text,
     DateTime,
     ForeignKey,
+    UniqueConstraint,
     create_engine,
+    delete,
+    func,
+    inspect,
+    make_url,
+    select,
+    text,
+    update,
 )
 from sqlalchemy.orm import (
     DeclarativeBase,
@@ -26,6 +35,8 @@ from sqlalchemy.orm import (
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
 
+logger = logging.getLogger(__name__)
+
 
 class Base(DeclarativeBase):
     """Base class for all database models."""
@@ -40,6 +51,13 @@ class Conversation(Base):
     """
     
     __tablename__ = "conversations"
+    __table_args__ = (
+        UniqueConstraint(
+            "telegram_user_id",
+            "telegram_chat_id",
+            name="uq_conversations_user_chat",
+        ),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     telegram_user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
@@ -197,7 +215,17 @@ class DatabaseManager:
             database_url: SQLAlchemy database URL
             echo: Whether to log SQL statements
         """
-        self.engine = create_engine(database_url, echo=echo)
+        engine_options: dict[str, int | bool] = {}
+        if make_url(database_url).get_backend_name() != "sqlite":
+            # Keep a small pool of checked connections for server databases
+            engine_options = {
+                "pool_size": 5,
+                "max_overflow": 10,
+                "pool_recycle": 1800,
+                "pool_pre_ping": True,
+            }
+        
+        self.engine = create_engine(database_url, echo=echo, **engine_options)
         self.SessionLocal = sessionmaker(
             autocommit=False,
             autoflush=False,
@@ -205,8 +233,64 @@ class DatabaseManager:
         )
     
     def create_tables(self) -> None:
-        """Create all database tables."""
+        """Create all database tables and bring existing ones up to date."""
         Base.metadata.create_all(bind=self.engine)
+        self._ensure_conversation_unique_index()
+    
+    def _ensure_conversation_unique_index(self) -> None:
+        """
+        Add the (user, chat) uniqueness to conversations tables that predate it.
+        
+        create_all() never alters an existing table, but the conversation
+        upsert needs the constraint. Duplicate conversations are merged into
+        the oldest one first, moving their messages, images and posts over.
+        """
+        columns = ["telegram_user_id", "telegram_chat_id"]
+        inspector = inspect(self.engine)
+        unique_column_sets = [
+            constraint["column_names"]
+            for constraint in inspector.get_unique_constraints(Conversation.__tablename__)
+        ] + [
+            index["column_names"]
+            for index in inspector.get_indexes(Conversation.__tablename__)
+            if index["unique"]
+        ]
+        if columns in unique_column_sets:
+            return
+        
+        logger.info("Adding unique (user, chat) index to conversations")
+        with self.engine.begin() as connection:
+            duplicates = connection.execute(
+                select(
+                    Conversation.telegram_user_id,
+                    Conversation.telegram_chat_id,
+                    func.min(Conversation.id),
+                )
+                .group_by(Conversation.telegram_user_id, Conversation.telegram_chat_id)
+                .having(func.count() > 1)
+            ).all()
+            
+            for user_id, chat_id, keep_id in duplicates:
+                merged_ids = select(Conversation.id).where(
+                    Conversation.telegram_user_id == user_id,
+                    Conversation.telegram_chat_id == chat_id,
+                    Conversation.id != keep_id,
+                )
+                for model in (Message, ImageVersion, GeneratedPost):
+                    table = Base.metadata.tables[model.__tablename__]
+                    connection.execute(
+                        update(table)
+                        .where(table.c.conversation_id.in_(merged_ids))
+                        .values(conversation_id=keep_id)
+                    )
+                connection.execute(
+                    delete(Conversation).where(Conversation.id.in_(merged_ids))
+                )
+            
+            connection.execute(text(
+                "CREATE UNIQUE INDEX uq_conversations_user_chat "
+                "ON conversations (telegram_user_id, telegram_chat_id)"
+            ))
     
     def drop_tables(self) -> None:
         """Drop all database tables (use with caution)."""
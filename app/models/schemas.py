@@ -209,6 +209,8 @@ class PostCreationRequest(BaseModel):
     prompt: str = Field(..., min_length=1)
     platforms: list[Platform]
     history: list[MessageBase] = Field(default_factory=list)
+    # Batch API: half the cost, but can take many minutes (non-interactive callers)
+    batch: bool = False
 
 
 class PostCreationResponse(BaseModel):
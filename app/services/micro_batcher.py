@@ -0,0 +1,99 @@
+"""
+Asyncio micro-batcher that coalesces concurrent calls into batches.
+
+Calls arriving within a short window are handed to one batch handler, so
+N concurrent requests cost one upstream round-trip instead of N.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Collects submitted items and flushes them to a batch handler.
+    
+    A batch is flushed when it reaches max_batch items or max_wait seconds
+    after its first item arrived, whichever comes first. The handler must
+    return one result per item, in order.
+    """
+    
+    def __init__(
+        self,
+        handler: Callable[[list[T]], Awaitable[list[R]]],
+        max_batch: int = 16,
+        max_wait: float = 0.025,
+    ):
+        """
+        Initialize micro-batcher.
+        
+        Args:
+            handler: Coroutine function processing a batch of items
+            max_batch: Maximum items per batch
+            max_wait: Seconds to wait for more items before flushing
+        """
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: list[tuple[T, asyncio.Future[R]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task[None]] = set()
+    
+    async def submit(self, item: T) -> R:
+        """
+        Submit an item and wait for its result.
+        
+        Args:
+            item: Item to process
+            
+        Returns:
+            Handler result for this item
+            
+        Raises:
+            Exception: Whatever the handler raised for the batch
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[R] = loop.create_future()
+        self._pending.append((item, future))
+        
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        
+        return await future
+    
+    def _flush(self) -> None:
+        """Hand the pending items to the handler as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task isn't garbage collected mid-run
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+    
+    async def _run(self, batch: list[tuple[T, asyncio.Future[R]]]) -> None:
+        """Run the handler and resolve each caller's future."""
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Batch handler returned {len(results)} results for {len(batch)} items"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
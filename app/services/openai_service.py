@@ -2,31 +2,265 @@
 OpenAI service integration with strict typing and error handling.
 """
 
+import asyncio
+import hashlib
 import logging
+import time
+from collections.abc import AsyncIterator, Sequence
+from functools import lru_cache
+from itertools import islice
 from typing import Literal
-from openai import AsyncOpenAI, OpenAIError
-from app.types import MessageDict
+import httpx
+import orjson
+from openai import NOT_GIVEN, AsyncOpenAI, DefaultAsyncHttpxClient, OpenAIError
+from app.types import (
+    CompletionRequest,
+    ImageRequestClassification,
+    MessageDict,
+    MessageRole,
+    RequestClassification,
+)
 from app.config import get_settings
+from app.services.micro_batcher import MicroBatcher
+from app.services.response_cache import ResponseCache
+from app.services.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Batch statuses after which polling stops
+_BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# History messages given to classifiers as context
+_CLASSIFIER_CONTEXT_SIZE = 3
+
+# Accepted classifier labels and common variants, mapped to their canonical label
+_INTENT_ALIASES = {
+    "create_post": "create_post",
+    "create": "create_post",
+    "post": "create_post",
+    "edit_image": "edit_image",
+    "edit": "edit_image",
+    "schedule_post": "schedule_post",
+    "schedule": "schedule_post",
+    "general": "general",
+}
+_IMAGE_INTENT_ALIASES = {
+    "edit_only": "edit_only",
+    "edit": "edit_only",
+    "post_only": "post_only",
+    "post": "post_only",
+    "both": "both",
+}
+
+# Accepted platform names, mapped to their canonical name
+_PLATFORM_ALIASES = {
+    "x": "x",
+    "twitter": "x",
+    "linkedin": "linkedin",
+    "instagram": "instagram",
+    "youtube": "youtube",
+    "school": "school",
+}
+
+# Classifier system prompts, built once so every call sends an identical prefix
+_INTENT_PROMPT = """You are an intent classifier for an AI social media system.
+
+Analyze the user's message and classify it into one of these intents:
+- create_post: User wants to create social media content
+- edit_image: User wants to edit an image (but no image uploaded yet)
+- schedule_post: User wants social media content prepared for later or scheduled publishing
+- general: General conversation or unclear intent
+
+Respond with ONLY the intent name, nothing else."""
+
+_IMAGE_INTENT_PROMPT = """You are an intent classifier for image-related requests.
+
+Analyze the caption and classify it into one of these intents:
+- edit_only: User wants to edit/modify the image
+- post_only: User wants to create a social media post about the image
+- both: User wants both image editing and post creation
+
+Respond with ONLY the intent name, nothing else."""
+
+_PLATFORMS_PROMPT = """You are a platform detector for social media content creation.
+
+Analyze the request and identify which platforms they want content for.
+
+Available platforms: x, linkedin, instagram, youtube, school
+
+Respond with a comma-separated list or "none" if no specific platform mentioned.
+Example: "linkedin" or "x,instagram" or "none"
+"""
+
+_SAME_REQUEST_PROMPT = """You compare two social media content requests.
+
+Answer "yes" if a single post would satisfy both requests equally well
+(same topic, angle and constraints), otherwise answer "no".
+
+Respond with ONLY yes or no."""
+
+# Shared by the single and batched request classifiers
+_REQUEST_LABELS = """Classify the user's message into one of these intents:
+- create_post: User wants to create social media content
+- edit_image: User wants to edit an image (but no image uploaded yet)
+- schedule_post: User wants social media content prepared for later or scheduled publishing
+- general: General conversation or unclear intent
+
+For create_post and schedule_post, also list the platforms the content is for.
+Available platforms: x, linkedin, instagram, youtube, school"""
+
+_CLASSIFY_REQUEST_PROMPT = f"""You are a request classifier for an AI social media system.
+
+{_REQUEST_LABELS}
+
+Respond with a JSON object only, for example:
+{{"intent": "create_post", "platforms": ["linkedin", "x"]}}
+Use an empty platforms list if no specific platform is mentioned."""
+
+_CLASSIFY_REQUEST_BATCH_PROMPT = f"""You are a request classifier for an AI social media system.
+
+You receive a JSON array of user messages, each with an id, its text and the
+recent conversation context. For each message:
+
+{_REQUEST_LABELS}
+
+Respond with a JSON object only, with one result per message id, for example:
+{{"results": [{{"id": 0, "intent": "create_post", "platforms": ["linkedin"]}}, {{"id": 1, "intent": "general", "platforms": []}}]}}
+Use an empty platforms list if no specific platform is mentioned."""
+
+_CLASSIFY_IMAGE_REQUEST_PROMPT = """You are a request classifier for image uploads.
+
+Classify the caption into one of these image intents:
+- edit_only: User wants to edit/modify the image
+- post_only: User wants to create a social media post about the image
+- both: User wants both image editing and post creation
+
+For post_only and both, also list the platforms the post is for.
+Available platforms: x, linkedin, instagram, youtube, school
+
+Respond with a JSON object only, for example:
+{"image_intent": "post_only", "platforms": ["instagram"]}
+Use an empty platforms list if no specific platform is mentioned."""
+
+_INTENT_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _INTENT_PROMPT}
+_IMAGE_INTENT_SYSTEM_MSG: MessageDict = {
+    "role": MessageRole.SYSTEM,
+    "content": _IMAGE_INTENT_PROMPT,
+}
+_PLATFORMS_SYSTEM_MSG: MessageDict = {"role": MessageRole.SYSTEM, "content": _PLATFORMS_PROMPT}
+_SAME_REQUEST_SYSTEM_MSG: MessageDict = {
+    "role": MessageRole.SYSTEM,
+    "content": _SAME_REQUEST_PROMPT,
+}
+_CLASSIFY_REQUEST_SYSTEM_MSG: MessageDict = {
+    "role": MessageRole.SYSTEM,
+    "content": _CLASSIFY_REQUEST_PROMPT,
+}
+_CLASSIFY_IMAGE_REQUEST_SYSTEM_MSG: MessageDict = {
+    "role": MessageRole.SYSTEM,
+    "content": _CLASSIFY_IMAGE_REQUEST_PROMPT,
+}
+_CLASSIFY_REQUEST_BATCH_SYSTEM_MSG: MessageDict = {
+    "role": MessageRole.SYSTEM,
+    "content": _CLASSIFY_REQUEST_BATCH_PROMPT,
+}
+
+# Raw classifier outputs, keyed by classifier, context and normalized input
+_classifier_cache = ResponseCache(
+    maxsize=settings.CLASSIFIER_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+_classifier_semantic_cache: SemanticCache | None = (
+    SemanticCache(
+        dimensions=settings.SEMANTIC_CACHE_DIMENSIONS,
+        maxsize=settings.CLASSIFIER_CACHE_MAX_SIZE,
+        ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    )
+    if settings.CLASSIFIER_SEMANTIC_CACHE_ENABLED
+    else None
+)
+
+
+def _recent_context(history: Sequence[MessageDict]) -> tuple[MessageDict, ...]:
+    """Take the last few history messages, without copying the whole history."""
+    return tuple(islice(history, max(len(history) - _CLASSIFIER_CONTEXT_SIZE, 0), None))
+
+
+def _normalize_platforms(platforms: list[str]) -> list[str]:
+    """Drop unknown platform names and map the twitter alias to x."""
+    return [
+        _PLATFORM_ALIASES[p]
+        for p in (p.lower().strip() for p in platforms)
+        if p in _PLATFORM_ALIASES
+    ]
+
+
+def _canonical_label(label: str, aliases: dict[str, str]) -> str | None:
+    """Map a raw model label to its canonical name, or None if unknown."""
+    return aliases.get(label.lower().strip(" \t\n.'\"`"))
+
+
+def _parse_classification(result: dict) -> RequestClassification:
+    """Validate a raw request classification from the model."""
+    raw_intent = str(result.get("intent", ""))
+    platforms = result.get("platforms") or []
+    if isinstance(platforms, str):
+        platforms = platforms.split(",")
+    
+    intent = _canonical_label(raw_intent, _INTENT_ALIASES)
+    if intent is None:
+        logger.warning("Invalid intent returned: %s, defaulting to 'general'", raw_intent)
+        intent = "general"
+    
+    return {
+        "intent": intent,  # type: ignore
+        "platforms": _normalize_platforms([str(p) for p in platforms]),
+    }
+
 
 class OpenAIService:
     """Service for interacting with OpenAI API."""
     
     def __init__(self):
         """Initialize OpenAI service."""
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # One pooled HTTP/2 connection multiplexes concurrent requests
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=128, max_keepalive_connections=64),
+            ),
+        )
         self.model = settings.OPENAI_MODEL
+        self.classifier_model = settings.OPENAI_CLASSIFIER_MODEL
         self.temperature = settings.OPENAI_TEMPERATURE
         self.max_tokens = settings.OPENAI_MAX_TOKENS
+        
+        # Coalesces concurrent classify_request calls (opt-in)
+        self._classify_batcher: MicroBatcher | None = (
+            MicroBatcher(
+                self._classify_batch,
+                max_batch=settings.CLASSIFIER_BATCH_MAX_SIZE,
+                max_wait=settings.CLASSIFIER_BATCH_MAX_WAIT_MS / 1000,
+            )
+            if settings.CLASSIFIER_BATCHING_ENABLED
+            else None
+        )
+    
+    async def close(self) -> None:
+        """Close the HTTP connection pool."""
+        await self.client.close()
     
     async def complete(
         self,
-        messages: list[MessageDict],
+        messages: Sequence[MessageDict],
         temperature: float | None = None,
         max_tokens: int | None = None,
+        json_mode: bool = False,
+        cache_key: str | None = None,
+        model: str | None = None,
     ) -> str:
         """
         Get a completion from OpenAI.
@@ -35,6 +269,10 @@ class OpenAIService:
             messages: List of conversation messages
             temperature: Sampling temperature (overrides default)
             max_tokens: Maximum tokens to generate (overrides default)
+            json_mode: Constrain the response to a JSON object
+            cache_key: Prompt cache routing key shared by requests with the
+                same static prefix, so they land where that prefix is cached
+            model: Model to use (overrides default)
             
         Returns:
             Generated text response
@@ -44,10 +282,12 @@ class OpenAIService:
         """
         try:
             response = await self.client.chat.completions.create(
-                model=self.model,
+                model=model or self.model,
                 messages=messages,  # type: ignore
-                temperature=temperature or self.temperature,
-                max_tokens=max_tokens or self.max_tokens,
+                temperature=self.temperature if temperature is None else temperature,
+                max_tokens=self.max_tokens if max_tokens is None else max_tokens,
+                response_format={"type": "json_object"} if json_mode else NOT_GIVEN,
+                extra_body={"prompt_cache_key": cache_key} if cache_key else None,
             )
             
             content = response.choices[0].message.content
@@ -56,18 +296,198 @@ class OpenAIService:
             
             return content.strip()
             
-        except OpenAIError as e:
-            logger.error(f"OpenAI API error: {e}")
+        except OpenAIError:
+            logger.exception("OpenAI API error")
+            raise
+        except Exception:
+            logger.exception("Unexpected error in OpenAI completion")
+            raise
+    
+    async def stream_complete(
+        self,
+        messages: Sequence[MessageDict],
+        temperature: float | None = None,
+        max_tokens: int | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream a completion from OpenAI as it is generated.
+        
+        Args:
+            messages: List of conversation messages
+            temperature: Sampling temperature (overrides default)
+            max_tokens: Maximum tokens to generate (overrides default)
+            
+        Yields:
+            Content deltas in generation order
+            
+        Raises:
+            OpenAIError: If API call fails
+        """
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,  # type: ignore
+                temperature=self.temperature if temperature is None else temperature,
+                max_tokens=self.max_tokens if max_tokens is None else max_tokens,
+                stream=True,
+            )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            
+        except OpenAIError:
+            logger.exception("OpenAI API error")
             raise
-        except Exception as e:
-            logger.error(f"Unexpected error in OpenAI completion: {e}")
+        except Exception:
+            logger.exception("Unexpected error in OpenAI streaming completion")
             raise
     
+    async def complete_batch(
+        self,
+        requests: list[CompletionRequest],
+        timeout: float,
+    ) -> list[str | None]:
+        """
+        Run completions through the Batch API at reduced cost.
+        
+        Requests are uploaded as a JSONL file, submitted as one batch, and
+        polled with exponential backoff until the batch finishes. If it is
+        still running when the timeout elapses it is cancelled.
+        
+        Args:
+            requests: Completion requests to submit
+            timeout: Maximum seconds to wait for the batch
+            
+        Returns:
+            Generated text per request, in request order; None for requests
+            that failed inside the batch
+            
+        Raises:
+            OpenAIError: If an API call fails
+            TimeoutError: If the batch did not finish within the timeout
+            RuntimeError: If the batch failed, expired or was cancelled
+        """
+        lines = [
+            orjson.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": request["messages"],
+                    "temperature": request["temperature"],
+                    "max_tokens": request["max_tokens"],
+                },
+            })
+            for i, request in enumerate(requests)
+        ]
+        
+        batch_file = await self.client.files.create(
+            file=("requests.jsonl", b"\n".join(lines)),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info("Submitted batch %s with %d requests", batch.id, len(requests))
+        
+        deadline = time.monotonic() + timeout
+        delay = 1.0
+        while batch.status not in _BATCH_TERMINAL_STATUSES:
+            if time.monotonic() + delay > deadline:
+                await self.client.batches.cancel(batch.id)
+                raise TimeoutError(f"Batch {batch.id} did not finish within {timeout}s")
+            
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+            batch = await self.client.batches.retrieve(batch.id)
+            logger.debug("Batch %s status: %s (%s)", batch.id, batch.status, batch.request_counts)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+        
+        output = await self.client.files.content(batch.output_file_id)
+        
+        results: list[str | None] = [None] * len(requests)
+        total_tokens = 0
+        for line in output.text.splitlines():
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(
+                    "Batch request %s failed: %s", record["custom_id"], record.get("error")
+                )
+                continue
+            
+            body = response["body"]
+            total_tokens += body.get("usage", {}).get("total_tokens", 0)
+            content = body["choices"][0]["message"]["content"]
+            if content is not None:
+                results[int(record["custom_id"])] = content.strip()
+        
+        logger.info("Batch %s completed (%d tokens)", batch.id, total_tokens)
+        return results
+    
+    async def embed(self, text: str) -> list[float]:
+        """
+        Embed text for semantic similarity comparisons.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector of SEMANTIC_CACHE_DIMENSIONS floats
+            
+        Raises:
+            OpenAIError: If API call fails
+        """
+        response = await self.client.embeddings.create(
+            model=settings.OPENAI_EMBEDDING_MODEL,
+            input=text,
+            dimensions=settings.SEMANTIC_CACHE_DIMENSIONS,
+        )
+        return response.data[0].embedding
+    
+    async def is_same_request(self, first: str, second: str) -> bool:
+        """
+        Check whether two content requests ask for the same post.
+        
+        Used to confirm borderline semantic cache matches.
+        
+        Args:
+            first: Previously answered request
+            second: New request
+            
+        Returns:
+            True if one response would serve both requests
+        """
+        messages: list[MessageDict] = [
+            _SAME_REQUEST_SYSTEM_MSG,
+            {"role": MessageRole.USER, "content": f"Request 1: {first}\nRequest 2: {second}"},
+        ]
+        
+        try:
+            result = await self.complete(
+                messages,
+                temperature=0.0,
+                max_tokens=3,
+                cache_key="classifier:same_request",
+                model=self.classifier_model,
+            )
+            return result.lower().strip().startswith("yes")
+            
+        except Exception:
+            logger.exception("Error comparing requests")
+            return False
+    
     async def analyze_intent(
         self,
         text: str,
-        history: list[MessageDict],
-    ) -> Literal["create_post", "edit_image", "general"]:
+        history: Sequence[MessageDict],
+    ) -> Literal["create_post", "edit_image", "schedule_post", "general"]:
         """
         Analyze user intent from text.
         
@@ -78,35 +498,139 @@ class OpenAIService:
         Returns:
             Detected intent
         """
-        system_prompt = """You are an intent classifier for an AI social media system.
-
-Analyze the user's message and classify it into one of these intents:
-- create_post: User wants to create social media content
-- edit_image: User wants to edit an image (but no image uploaded yet)
-- general: General conversation or unclear intent
-
-Respond with ONLY the intent name, nothing else."""
-        
+        context = _recent_context(history)
         messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            *history[-3:],  # Last 3 messages for context
-            {"role": "user", "content": text},
+            _INTENT_SYSTEM_MSG,
+            *context,
+            {"role": MessageRole.USER, "content": text},
         ]
         
         try:
-            result = await self.complete(messages, temperature=0.0, max_tokens=20)
-            intent = result.lower().strip()
+            result = await self._complete_classifier(
+                "intent", text, messages, context, max_tokens=6, semantic=True
+            )
+            intent = _canonical_label(result, _INTENT_ALIASES)
             
-            if intent in ["create_post", "edit_image", "general"]:
+            if intent is not None:
                 return intent  # type: ignore
             
-            logger.warning(f"Invalid intent returned: {intent}, defaulting to 'general'")
+            logger.warning("Invalid intent returned: %s, defaulting to 'general'", result)
             return "general"
             
-        except Exception as e:
-            logger.error(f"Error analyzing intent: {e}")
+        except Exception:
+            logger.exception("Error analyzing intent")
             return "general"
     
+    async def classify_request(
+        self,
+        text: str,
+        history: Sequence[MessageDict],
+    ) -> RequestClassification:
+        """
+        Detect intent and target platforms from text in a single call.
+        
+        Replaces analyze_intent followed by detect_platforms, saving a
+        round-trip before post generation starts. With
+        CLASSIFIER_BATCHING_ENABLED, concurrent calls are coalesced into
+        one completion.
+        
+        Args:
+            text: User's message
+            history: Recent conversation history
+            
+        Returns:
+            Detected intent and platforms (empty if none mentioned)
+        """
+        context = _recent_context(history)
+        
+        if self._classify_batcher is None:
+            return await self._classify_single((text, context))
+        
+        try:
+            return await self._classify_batcher.submit((text, context))
+        except Exception:
+            logger.exception("Error classifying request batch")
+            return {"intent": "general", "platforms": []}
+    
+    async def _classify_single(
+        self,
+        request: tuple[str, Sequence[MessageDict]],
+    ) -> RequestClassification:
+        """Classify one message with its (already trimmed) context."""
+        text, context = request
+        messages: list[MessageDict] = [
+            _CLASSIFY_REQUEST_SYSTEM_MSG,
+            *context,
+            {"role": MessageRole.USER, "content": text},
+        ]
+        
+        try:
+            result = orjson.loads(
+                await self._complete_classifier(
+                    "request", text, messages, context, max_tokens=60, json_mode=True
+                )
+            )
+            return _parse_classification(result)
+            
+        except Exception:
+            logger.exception("Error classifying request")
+            return {"intent": "general", "platforms": []}
+    
+    async def _classify_batch(
+        self,
+        requests: list[tuple[str, Sequence[MessageDict]]],
+    ) -> list[RequestClassification]:
+        """
+        Classify several messages in one completion.
+        
+        Messages missing from the response, or all of them if the call
+        fails, are classified individually instead.
+        """
+        if len(requests) == 1:
+            return [await self._classify_single(requests[0])]
+        
+        payload = orjson.dumps([
+            {
+                "id": i,
+                "text": text,
+                "context": [{"role": m["role"], "content": m["content"]} for m in context],
+            }
+            for i, (text, context) in enumerate(requests)
+        ]).decode()
+        messages: list[MessageDict] = [
+            _CLASSIFY_REQUEST_BATCH_SYSTEM_MSG,
+            {"role": MessageRole.USER, "content": payload},
+        ]
+        
+        results: dict[int, RequestClassification] = {}
+        try:
+            output = orjson.loads(
+                await self.complete(
+                    messages,
+                    temperature=0.0,
+                    max_tokens=20 + 40 * len(requests),
+                    json_mode=True,
+                    cache_key="classifier:request_batch",
+                    model=self.classifier_model,
+                )
+            )
+            for item in output.get("results", []):
+                results[int(item["id"])] = _parse_classification(item)
+            logger.debug("Classified %d requests in one call", len(requests))
+        except Exception:
+            logger.warning(
+                "Batched classification failed, classifying individually", exc_info=True
+            )
+        
+        missing = [i for i in range(len(requests)) if i not in results]
+        if missing:
+            fallback = await asyncio.gather(
+                *(self._classify_single(requests[i]) for i in missing)
+            )
+            results.update(zip(missing, fallback))
+        
+        return [results[i] for i in range(len(requests))]
+    
     async def analyze_image_intent(
         self,
         caption: str,
@@ -120,34 +644,70 @@ Respond with ONLY the intent name, nothing else."""
         Returns:
             Detected image intent
         """
-        system_prompt = """You are an intent classifier for image-related requests.
-
-Analyze the caption and classify it into one of these intents:
-- edit_only: User wants to edit/modify the image
-- post_only: User wants to create a social media post about the image
-- both: User wants both image editing and post creation
-
-Respond with ONLY the intent name, nothing else."""
-        
         messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": caption},
+            _IMAGE_INTENT_SYSTEM_MSG,
+            {"role": MessageRole.USER, "content": caption},
         ]
         
         try:
-            result = await self.complete(messages, temperature=0.0, max_tokens=20)
-            intent = result.lower().strip()
+            result = await self._complete_classifier(
+                "image_intent", caption, messages, max_tokens=6, semantic=True
+            )
+            intent = _canonical_label(result, _IMAGE_INTENT_ALIASES)
             
-            if intent in ["edit_only", "post_only", "both"]:
+            if intent is not None:
                 return intent  # type: ignore
             
-            logger.warning(f"Invalid image intent: {intent}, defaulting to 'edit_only'")
+            logger.warning("Invalid image intent: %s, defaulting to 'edit_only'", result)
             return "edit_only"
             
-        except Exception as e:
-            logger.error(f"Error analyzing image intent: {e}")
+        except Exception:
+            logger.exception("Error analyzing image intent")
             return "edit_only"
     
+    async def classify_image_request(self, caption: str) -> ImageRequestClassification:
+        """
+        Detect image intent and target platforms from a caption in a single call.
+        
+        Replaces analyze_image_intent followed by detect_platforms when an
+        image caption asks for a post.
+        
+        Args:
+            caption: User's caption/instructions
+            
+        Returns:
+            Detected image intent and platforms (empty if none mentioned)
+        """
+        messages: list[MessageDict] = [
+            _CLASSIFY_IMAGE_REQUEST_SYSTEM_MSG,
+            {"role": MessageRole.USER, "content": caption},
+        ]
+        
+        try:
+            result = orjson.loads(
+                await self._complete_classifier(
+                    "image_request", caption, messages, max_tokens=60, json_mode=True
+                )
+            )
+            raw_intent = str(result.get("image_intent", ""))
+            platforms = result.get("platforms") or []
+            if isinstance(platforms, str):
+                platforms = platforms.split(",")
+            
+            intent = _canonical_label(raw_intent, _IMAGE_INTENT_ALIASES)
+            if intent is None:
+                logger.warning("Invalid image intent: %s, defaulting to 'edit_only'", raw_intent)
+                intent = "edit_only"
+            
+            return {
+                "image_intent": intent,  # type: ignore
+                "platforms": _normalize_platforms([str(p) for p in platforms]),
+            }
+            
+        except Exception:
+            logger.exception("Error classifying image request")
+            return {"image_intent": "edit_only", "platforms": []}
+    
     async def detect_platforms(self, prompt: str) -> list[str]:
         """
         Detect which platforms user wants content for.
@@ -158,38 +718,109 @@ Respond with ONLY the intent name, nothing else."""
         Returns:
             List of platform names
         """
-        system_prompt = """You are a platform detector for social media content creation.
-
-Analyze the request and identify which platforms they want content for.
-
-Available platforms: x, linkedin, instagram, youtube, school
-
-Respond with a comma-separated list or "none" if no specific platform mentioned.
-Example: "linkedin" or "x,instagram" or "none"
-"""
-        
         messages: list[MessageDict] = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt},
+            _PLATFORMS_SYSTEM_MSG,
+            {"role": MessageRole.USER, "content": prompt},
         ]
         
         try:
-            result = await self.complete(messages, temperature=0.0, max_tokens=50)
+            result = await self._complete_classifier(
+                "platforms", prompt, messages, max_tokens=16
+            )
             result = result.lower().strip()
             
             if result == "none":
                 return []
             
             # Parse and validate platforms
-            platforms = [p.strip() for p in result.split(",")]
-            valid_platforms = ["x", "twitter", "linkedin", "instagram", "youtube", "school"]
-            
-            return [
-                "x" if p == "twitter" else p
-                for p in platforms
-                if p in valid_platforms
-            ]
+            return _normalize_platforms(result.split(","))
             
-        except Exception as e:
-            logger.error(f"Error detecting platforms: {e}")
+        except Exception:
+            logger.exception("Error detecting platforms")
             return []
+    
+    async def _complete_classifier(
+        self,
+        name: str,
+        text: str,
+        messages: Sequence[MessageDict],
+        context: Sequence[MessageDict] = (),
+        max_tokens: int = 20,
+        json_mode: bool = False,
+        semantic: bool = False,
+    ) -> str:
+        """
+        Run a deterministic classifier completion through the classifier caches.
+        
+        Completions use the smaller OPENAI_CLASSIFIER_MODEL at temperature 0.
+        The raw completion is cached, so callers parse and validate hits
+        exactly like fresh results, and failed calls are never cached.
+        Identical inputs (ignoring case and surrounding whitespace) skip the
+        API entirely. For label-only classifiers (semantic=True) with
+        CLASSIFIER_SEMANTIC_CACHE_ENABLED, inputs whose embedding is within
+        CLASSIFIER_CACHE_SIMILARITY_THRESHOLD of a cached one reuse its
+        result as well. Classifiers returning platforms must not: prompts
+        differing only in the platform name embed almost identically.
+        
+        Args:
+            name: Classifier name, so classifiers never share entries
+            text: User input being classified
+            messages: Full classifier messages
+            context: History messages included in the prompt
+            max_tokens: Maximum tokens to generate
+            json_mode: Constrain the response to a JSON object
+            semantic: Also match paraphrased inputs by embedding similarity
+            
+        Returns:
+            Raw completion text
+        """
+        scope = hashlib.blake2b(
+            "|".join([name, *(m["content"] for m in context)]).encode(),
+            digest_size=16,
+        ).hexdigest()
+        key = f"{scope}|{text.strip().lower()}"
+        
+        cached = _classifier_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        semantic_cache = _classifier_semantic_cache if semantic else None
+        embedding: list[float] | None = None
+        if semantic_cache is not None:
+            try:
+                embedding = await self.embed(text)
+            except Exception:
+                logger.warning(
+                    "Classifier embedding failed, skipping semantic cache", exc_info=True
+                )
+            
+            if embedding is not None:
+                match = semantic_cache.lookup(scope, embedding)
+                if match and match.similarity >= settings.CLASSIFIER_CACHE_SIMILARITY_THRESHOLD:
+                    _classifier_cache.set(key, match.response)
+                    return match.response
+        
+        result = await self.complete(
+            messages,
+            temperature=0.0,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+            cache_key=f"classifier:{name}",
+            model=self.classifier_model,
+        )
+        
+        _classifier_cache.set(key, result)
+        if semantic_cache is not None and embedding is not None:
+            semantic_cache.add(scope, embedding, text, result)
+        return result
+
+
+@lru_cache
+def get_openai_service() -> OpenAIService:
+    """
+    Get the shared OpenAI service instance.
+    
+    All agents use this instance so requests share one client and its
+    connection pool instead of opening one per agent.
+    """
+    return OpenAIService()
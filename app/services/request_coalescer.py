@@ -0,0 +1,65 @@
+"""
+Asyncio request coalescer that shares in-flight calls between callers.
+
+Callers asking for the same key while a call is still running wait on
+that call instead of starting their own, so N identical concurrent
+requests cost one upstream round-trip instead of N.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Generic, TypeVar
+
+R = TypeVar("R")
+
+
+class RequestCoalescer(Generic[R]):
+    """
+    Runs at most one call per key at a time.
+    
+    Every caller gets the shared call's result or exception. A caller being
+    cancelled doesn't cancel the call while others still wait on it; the
+    call is only cancelled once all of its callers have gone.
+    """
+    
+    def __init__(self) -> None:
+        """Initialize request coalescer."""
+        self._calls: dict[str, asyncio.Task[R]] = {}
+        self._waiters: dict[asyncio.Task[R], int] = {}
+    
+    async def run(self, key: str, call: Callable[[], Awaitable[R]]) -> R:
+        """
+        Run call for key, or join the call already running for it.
+        
+        Args:
+            key: Identity of the request; equal keys share one call
+            call: Coroutine function starting the request
+            
+        Returns:
+            Result of the shared call
+            
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            remaining = self._waiters.get(task)
+            if remaining is not None:
+                self._waiters[task] = remaining - 1
+                if remaining == 1:
+                    # Last caller gone; a finished task ignores this
+                    task.cancel()
+    
+    def _forget(self, key: str, task: asyncio.Task[R]) -> None:
+        """Drop a finished call so the next request for its key starts afresh."""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        self._waiters.pop(task, None)
@@ -0,0 +1,76 @@
+"""
+In-memory response cache with LRU eviction and per-entry TTL.
+
+Used to serve repeated generation requests without another OpenAI round-trip.
+"""
+
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed TTL.
+    
+    All operations are synchronous and never await, so they are atomic with
+    respect to other coroutines on the event loop and need no lock.
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        """
+        Initialize response cache.
+        
+        Args:
+            maxsize: Maximum number of entries kept before evicting the oldest
+            ttl: Seconds an entry stays valid after being stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> str | None:
+        """
+        Get a cached value.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a value, evicting the least recently used entry if full.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, key: str) -> None:
+        """Remove a single entry if present."""
+        self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
@@ -0,0 +1,115 @@
+"""
+In-memory semantic response cache keyed by prompt embeddings.
+
+Serves a cached response when a new prompt is close enough in meaning to
+one already answered, not just byte-identical.
+"""
+
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
+
+
+class SemanticMatch(NamedTuple):
+    """Closest cached entry for a lookup."""
+    similarity: float
+    prompt: str
+    response: str
+
+
+class SemanticCache:
+    """
+    Bounded LRU cache of responses, matched by cosine similarity.
+    
+    Embeddings live in one preallocated matrix so a lookup is a single
+    matrix-vector product. Entries are grouped by scope (e.g. platform and
+    conversation context) and only compared within the same scope.
+    
+    All operations are synchronous and never await, so they are atomic with
+    respect to other coroutines on the event loop and need no lock.
+    """
+    
+    def __init__(self, dimensions: int, maxsize: int = 1024, ttl: float = 3600.0):
+        """
+        Initialize semantic cache.
+        
+        Args:
+            dimensions: Length of the embedding vectors
+            maxsize: Maximum number of entries kept before evicting the oldest
+            ttl: Seconds an entry stays valid after being stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._vectors = np.zeros((maxsize, dimensions), dtype=np.float32)
+        # slot -> (scope, expires_at, prompt, response), in LRU order
+        self._entries: OrderedDict[int, tuple[str, float, str, str]] = OrderedDict()
+        self._free = list(range(maxsize - 1, -1, -1))
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def lookup(self, scope: str, embedding: list[float]) -> SemanticMatch | None:
+        """
+        Find the most similar cached entry in a scope.
+        
+        Args:
+            scope: Entry group to search
+            embedding: Embedding of the new prompt
+            
+        Returns:
+            Closest match with its cosine similarity, or None if the scope
+            has no live entries
+        """
+        now = time.monotonic()
+        slots = []
+        for slot, (entry_scope, expires_at, _, _) in list(self._entries.items()):
+            if expires_at < now:
+                self._release(slot)
+            elif entry_scope == scope:
+                slots.append(slot)
+        
+        if not slots:
+            return None
+        
+        similarities = self._vectors[slots] @ self._normalize(embedding)
+        best = int(np.argmax(similarities))
+        slot = slots[best]
+        
+        self._entries.move_to_end(slot)
+        _, _, prompt, response = self._entries[slot]
+        return SemanticMatch(float(similarities[best]), prompt, response)
+    
+    def add(self, scope: str, embedding: list[float], prompt: str, response: str) -> None:
+        """
+        Store a response, evicting the least recently used entry if full.
+        
+        Args:
+            scope: Entry group the response belongs to
+            embedding: Embedding of the prompt
+            prompt: Prompt that produced the response
+            response: Response to cache
+        """
+        if not self._free:
+            self._release(next(iter(self._entries)))
+        
+        slot = self._free.pop()
+        self._vectors[slot] = self._normalize(embedding)
+        self._entries[slot] = (scope, time.monotonic() + self.ttl, prompt, response)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+        self._free = list(range(self.maxsize - 1, -1, -1))
+    
+    def _release(self, slot: int) -> None:
+        """Drop the entry in a slot and make the slot reusable."""
+        del self._entries[slot]
+        self._free.append(slot)
+    
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """Scale an embedding to unit length so dot products are cosines."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
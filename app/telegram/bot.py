@@ -2,8 +2,18 @@
 Telegram bot implementation with clean handler architecture.
 """
 
+import asyncio
 import logging
-from telegram import Update
+import os
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import suppress
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from telegram import Bot, Message as TelegramMessage, PhotoSize, Update
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,7 +21,7 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
-from app.types import UserID
+from app.types import ConversationID, MessageRole, UserID
 from app.config import get_settings
 from app.models.database import DatabaseManager, Conversation, Message
 from app.agents.super_agent import SuperAgent
@@ -19,6 +29,29 @@ from app.agents.super_agent import SuperAgent
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Minimum seconds between in-place edits of a streamed reply
+_STREAM_EDIT_INTERVAL = 0.5
+
+# Longest text Telegram accepts in one message
+_MAX_MESSAGE_LENGTH = 4096
+
+# Maximum (user, chat) -> conversation ID mappings kept in memory
+_CONVERSATION_CACHE_SIZE = 1024
+
+# Maximum per-conversation agents kept in memory
+_AGENT_CACHE_SIZE = 1024
+
+# Dialects supporting INSERT ... ON CONFLICT ... RETURNING
+_UPSERT_DIALECTS = ("postgresql", "sqlite")
+
+
+def _write_file_atomic(path: str, content: bytes) -> None:
+    """Write content to a temporary file, then rename it into place."""
+    temp_path = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
 
 class TelegramBot:
     """Manages Telegram bot lifecycle and message handling."""
@@ -32,6 +65,12 @@ class TelegramBot:
         """
         self.db_manager = db_manager
         self.application: Application | None = None
+        
+        # Recently seen conversations, in LRU order
+        self._conversation_ids: OrderedDict[tuple[UserID, int], ConversationID] = OrderedDict()
+        
+        # Agents for recently active conversations, in LRU order
+        self._agents: OrderedDict[ConversationID, SuperAgent] = OrderedDict()
     
     async def initialize(self) -> None:
         """Initialize the bot application."""
@@ -42,6 +81,9 @@ class TelegramBot:
         # Register handlers
         self.application.add_handler(CommandHandler("start", self._start_command))
         self.application.add_handler(CommandHandler("help", self._help_command))
+        self.application.add_handler(
+            CommandHandler("regenerate", self._regenerate_command)
+        )
         self.application.add_handler(MessageHandler(filters.PHOTO, self._handle_image))
         self.application.add_handler(
             MessageHandler(filters.TEXT & ~filters.COMMAND, self._handle_text)
@@ -59,6 +101,8 @@ class TelegramBot:
         await self.application.initialize()
         await self.application.start()
         await self.application.updater.start_polling(
+            # Long polling already waits server-side; never idle between polls
+            poll_interval=0.0,
             allowed_updates=Update.ALL_TYPES,
             drop_pending_updates=True,
         )
@@ -77,36 +121,159 @@ class TelegramBot:
             return True
         return user_id in settings.allowed_user_ids
     
-    def _get_or_create_conversation(
+    async def _get_or_create_conversation(
         self,
         user_id: UserID,
         chat_id: int,
-    ) -> Conversation:
-        """Get existing conversation or create new one."""
+    ) -> ConversationID:
+        """
+        Get the ID of the existing conversation or create a new one.
+        
+        IDs are cached in memory, so repeat messages from a chat skip the
+        database. The cache is only touched on the event loop; the database
+        lookup itself runs in a worker thread. Entries aren't expired, so
+        callers writing to the conversation must handle an ID whose row
+        has since been deleted (see _save_user_message).
+        
+        Args:
+            user_id: Telegram user ID
+            chat_id: Telegram chat ID
+            
+        Returns:
+            Conversation ID
+        """
+        key = (user_id, chat_id)
+        conversation_id = self._conversation_ids.get(key)
+        if conversation_id is not None:
+            self._conversation_ids.move_to_end(key)
+            return conversation_id
+        
+        conversation_id = await asyncio.to_thread(self._upsert_conversation, user_id, chat_id)
+        
+        self._conversation_ids[key] = conversation_id
+        if len(self._conversation_ids) > _CONVERSATION_CACHE_SIZE:
+            self._conversation_ids.popitem(last=False)
+        return conversation_id
+    
+    def _upsert_conversation(self, user_id: UserID, chat_id: int) -> ConversationID:
+        """
+        Return the conversation ID for a chat, inserting the row if needed.
+        
+        On PostgreSQL and SQLite a single upsert returns the ID whether or
+        not the row existed, which is also safe against concurrent creation.
+        Other databases select first and insert on a miss.
+        
+        Args:
+            user_id: Telegram user ID
+            chat_id: Telegram chat ID
+            
+        Returns:
+            Conversation ID
+        """
         session = self.db_manager.get_session()
         try:
-            conversation = (
-                session.query(Conversation)
-                .filter(
+            dialect = session.get_bind().dialect.name
+            if dialect in _UPSERT_DIALECTS:
+                stmt: postgresql.Insert | sqlite.Insert
+                if dialect == "postgresql":
+                    stmt = postgresql.insert(Conversation)
+                else:
+                    stmt = sqlite.insert(Conversation)
+                stmt = stmt.values(telegram_user_id=user_id, telegram_chat_id=chat_id)
+                # A no-op update, so RETURNING also yields an existing row
+                upsert = stmt.on_conflict_do_update(
+                    index_elements=["telegram_user_id", "telegram_chat_id"],
+                    set_={"telegram_user_id": stmt.excluded.telegram_user_id},
+                ).returning(Conversation.id)
+                upserted_id: ConversationID = session.execute(upsert).scalar_one()
+                session.commit()
+                return upserted_id
+            
+            conversation_id = session.execute(
+                select(Conversation.id).where(
                     Conversation.telegram_user_id == user_id,
                     Conversation.telegram_chat_id == chat_id,
                 )
-                .first()
-            )
-            
-            if not conversation:
+            ).scalar()
+            if conversation_id is None:
                 conversation = Conversation(
                     telegram_user_id=user_id,
                     telegram_chat_id=chat_id,
                 )
                 session.add(conversation)
+                session.flush()
+                conversation_id = conversation.id
                 session.commit()
-                session.refresh(conversation)
-            
-            return conversation
+            return conversation_id
         finally:
             session.close()
     
+    async def _save_user_message(
+        self,
+        user_id: UserID,
+        chat_id: int,
+        content: str,
+        message_type: str = "text",
+    ) -> ConversationID:
+        """
+        Save a user message to the chat's conversation.
+        
+        A cached conversation ID can outlive its row, since conversations
+        deleted in the database (and their messages, by cascade) are not
+        evicted from the cache. If the save fails on the foreign key, the
+        stale ID and its agent are dropped and the conversation is looked
+        up again before retrying once.
+        
+        Args:
+            user_id: Telegram user ID
+            chat_id: Telegram chat ID
+            content: Message text
+            message_type: Message type
+            
+        Returns:
+            ID of the conversation the message was saved to
+        """
+        conversation_id = await self._get_or_create_conversation(user_id, chat_id)
+        try:
+            await asyncio.to_thread(
+                self._save_message, conversation_id, "user", content, message_type
+            )
+        except IntegrityError:
+            logger.warning(
+                "Conversation %s no longer exists, looking it up again", conversation_id
+            )
+            self._conversation_ids.pop((user_id, chat_id), None)
+            self._agents.pop(conversation_id, None)
+            conversation_id = await self._get_or_create_conversation(user_id, chat_id)
+            await asyncio.to_thread(
+                self._save_message, conversation_id, "user", content, message_type
+            )
+        return conversation_id
+    
+    def _get_agent(self, conversation_id: ConversationID) -> SuperAgent:
+        """
+        Get the agent for a conversation, reusing it across messages.
+        
+        A reused agent keeps its loaded history, so its history is only read
+        from the database once per conversation.
+        
+        Args:
+            conversation_id: Conversation ID
+            
+        Returns:
+            SuperAgent for the conversation
+        """
+        agent = self._agents.get(conversation_id)
+        if agent is not None:
+            self._agents.move_to_end(conversation_id)
+            return agent
+        
+        agent = SuperAgent(conversation_id, self.db_manager)
+        self._agents[conversation_id] = agent
+        if len(self._agents) > _AGENT_CACHE_SIZE:
+            self._agents.popitem(last=False)
+        return agent
+    
     def _save_message(
         self,
         conversation_id: int,
@@ -128,6 +295,131 @@ class TelegramBot:
         finally:
             session.close()
     
+    async def _download_photo(self, bot: Bot, photo: PhotoSize) -> str:
+        """
+        Download a photo to a local file, reusing earlier downloads.
+        
+        Files are named by Telegram's file_unique_id, which is the same for
+        identical content, so re-sent photos skip the download entirely.
+        The file is written in a worker thread and moved into place
+        atomically, so a concurrent handler never reads a partial file.
+        
+        Args:
+            bot: Bot used to fetch the file
+            photo: Photo size to download
+            
+        Returns:
+            Path to the downloaded image
+        """
+        image_path = f"/tmp/telegram_image_{photo.file_unique_id}.jpg"
+        if os.path.exists(image_path):
+            logger.debug("Reusing downloaded image %s", image_path)
+            return image_path
+        
+        file = await bot.get_file(photo.file_id)
+        content = await file.download_as_bytearray()
+        await asyncio.to_thread(_write_file_atomic, image_path, content)
+        return image_path
+    
+    async def _reply_streaming(
+        self,
+        update: Update,
+        chunks: AsyncIterator[str],
+    ) -> str:
+        """
+        Reply with streamed text, editing the sent message as chunks arrive.
+        
+        Intermediate edits are throttled to one per _STREAM_EDIT_INTERVAL and
+        sent as plain text, since partial Markdown may not parse. A failed
+        intermediate edit (e.g. flood control) is skipped; the next one
+        catches up. Text beyond Telegram's length limit continues in a new
+        message. Each message ends with a Markdown edit, falling back to
+        plain text if the Markdown is rejected. If the chunks fail midway, the
+        text so far is shown before the error is re-raised.
+        
+        Args:
+            update: Incoming Telegram update
+            chunks: Response text chunks
+            
+        Returns:
+            Full response text
+        """
+        text = ""
+        start = 0  # Offset in text where the current message begins
+        reply: TelegramMessage | None = None
+        last_edit = 0.0
+        
+        try:
+            async for chunk in chunks:
+                text += chunk
+                
+                # Close off full messages, preferring to split at a line break
+                while len(text) - start > _MAX_MESSAGE_LENGTH:
+                    end = text.rfind("\n", start, start + _MAX_MESSAGE_LENGTH)
+                    if end <= start:
+                        end = start + _MAX_MESSAGE_LENGTH
+                    await self._finish_reply(update, reply, text[start:end])
+                    start, reply = end, None
+                
+                part = text[start:]
+                now = time.monotonic()
+                if not part.strip() or (
+                    reply is not None and now - last_edit < _STREAM_EDIT_INTERVAL
+                ):
+                    continue
+                
+                try:
+                    if reply is None:
+                        reply = await update.message.reply_text(part)
+                    else:
+                        await reply.edit_text(part)
+                except TelegramError as e:
+                    logger.warning("Streamed reply update failed: %s", e)
+                last_edit = now
+        except Exception:
+            # Show the text received so far; the caller reports the failure
+            if text[start:].strip():
+                with suppress(TelegramError):
+                    await self._finish_reply(update, reply, text[start:])
+            raise
+        
+        if reply is not None or text[start:].strip():
+            await self._finish_reply(update, reply, text[start:])
+        
+        return text
+    
+    async def _finish_reply(
+        self,
+        update: Update,
+        reply: TelegramMessage | None,
+        text: str,
+    ) -> None:
+        """
+        Show the final text of a streamed message, formatted as Markdown.
+        
+        Args:
+            update: Incoming Telegram update
+            reply: Message to edit, or None to send a new one
+            text: Final message text
+            
+        Raises:
+            BadRequest: If Telegram rejects the text even as plain text
+        """
+        for parse_mode in ("Markdown", None):
+            try:
+                if reply is None:
+                    await update.message.reply_text(text, parse_mode=parse_mode)
+                else:
+                    await reply.edit_text(text, parse_mode=parse_mode)
+                return
+            except BadRequest as e:
+                # The plain text already shown is final
+                if "not modified" in e.message.lower():
+                    return
+                if parse_mode is None:
+                    raise
+                logger.debug("Markdown reply rejected, sending plain text: %s", e)
+    
     async def _start_command(
         self,
         update: Update,
@@ -167,10 +459,46 @@ class TelegramBot:
             "**Tips:**\n"
             "• Be specific with your requests\n"
             "• You can generate content for multiple platforms at once\n"
+            "• Send /regenerate for fresh versions of your last request\n"
         )
         
         await update.message.reply_text(help_text, parse_mode="Markdown")
     
+    async def _regenerate_command(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+    ) -> None:
+        """Handle /regenerate command by repeating the last request uncached."""
+        if not self._check_authorization(update.effective_user.id):
+            await update.message.reply_text("⛔ You are not authorized to use this bot.")
+            return
+        
+        user_id = update.effective_user.id
+        chat_id = update.effective_chat.id
+        
+        logger.info("Regenerating last request for user %s", user_id)
+        
+        await update.message.chat.send_action("typing")
+        
+        try:
+            conversation_id = await self._get_or_create_conversation(user_id, chat_id)
+            agent = self._get_agent(conversation_id)
+            
+            response = await self._reply_streaming(update, agent.stream_regenerate())
+            
+            # Save assistant response
+            await asyncio.to_thread(
+                self._save_message, conversation_id, "assistant", response, "text"
+            )
+            agent.record_message(MessageRole.ASSISTANT, response)
+            
+        except Exception:
+            logger.exception("Error regenerating response")
+            await update.message.reply_text(
+                "❌ Sorry, I encountered an error. Please try again."
+            )
+    
     async def _handle_text(
         self,
         update: Update,
@@ -185,29 +513,27 @@ class TelegramBot:
         chat_id = update.effective_chat.id
         text = update.message.text
         
-        logger.info(f"Received text from user {user_id}: {text[:50]}...")
+        logger.info("Received text from user %s: %s...", user_id, text[:50])
         
         await update.message.chat.send_action("typing")
         
         try:
-            # Get or create conversation
-            conversation = self._get_or_create_conversation(user_id, chat_id)
+            # Save user message; DB calls run in a worker thread
+            conversation_id = await self._save_user_message(user_id, chat_id, text, "text")
+            agent = self._get_agent(conversation_id)
+            agent.record_message(MessageRole.USER, text)
             
-            # Save user message
-            self._save_message(conversation.id, "user", text, "text")
-            
-            # Process with SuperAgent
-            agent = SuperAgent(conversation.id, self.db_manager)
-            response = await agent.process_text(text)
+            # Process with SuperAgent, streaming the reply as it is generated
+            response = await self._reply_streaming(update, agent.stream_text(text))
             
             # Save assistant response
-            self._save_message(conversation.id, "assistant", response, "text")
-            
-            # Send response
-            await update.message.reply_text(response, parse_mode="Markdown")
+            await asyncio.to_thread(
+                self._save_message, conversation_id, "assistant", response, "text"
+            )
+            agent.record_message(MessageRole.ASSISTANT, response)
             
-        except Exception as e:
-            logger.error(f"Error processing text: {e}", exc_info=True)
+        except Exception:
+            logger.exception("Error processing text")
             await update.message.reply_text(
                 "❌ Sorry, I encountered an error. Please try again."
             )
@@ -226,40 +552,35 @@ class TelegramBot:
         chat_id = update.effective_chat.id
         caption = update.message.caption or ""
         
-        logger.info(f"Received image from user {user_id}")
+        logger.info("Received image from user %s", user_id)
         
         await update.message.chat.send_action("typing")
         
         try:
             # Download image
-            photo = update.message.photo[-1]
-            file = await context.bot.get_file(photo.file_id)
-            image_path = f"/tmp/telegram_image_{photo.file_id}.jpg"
-            await file.download_to_drive(image_path)
-            
-            # Get or create conversation
-            conversation = self._get_or_create_conversation(user_id, chat_id)
+            image_path = await self._download_photo(context.bot, update.message.photo[-1])
             
-            # Save user message
-            self._save_message(
-                conversation.id,
-                "user",
-                f"[Image uploaded] {caption}",
-                "image",
+            # Save user message; DB calls run in a worker thread
+            user_text = f"[Image uploaded] {caption}"
+            conversation_id = await self._save_user_message(
+                user_id, chat_id, user_text, "image"
             )
+            agent = self._get_agent(conversation_id)
+            agent.record_message(MessageRole.USER, user_text)
             
-            # Process with SuperAgent
-            agent = SuperAgent(conversation.id, self.db_manager)
-            response = await agent.process_image(image_path, caption)
+            # Process with SuperAgent, streaming the reply as it is generated
+            response = await self._reply_streaming(
+                update, agent.stream_image(image_path, caption)
+            )
             
             # Save assistant response
-            self._save_message(conversation.id, "assistant", response, "text")
-            
-            # Send response
-            await update.message.reply_text(response, parse_mode="Markdown")
+            await asyncio.to_thread(
+                self._save_message, conversation_id, "assistant", response, "text"
+            )
+            agent.record_message(MessageRole.ASSISTANT, response)
             
-        except Exception as e:
-            logger.error(f"Error processing image: {e}", exc_info=True)
+        except Exception:
+            logger.exception("Error processing image")
             await update.message.reply_text(
                 "❌ Sorry, I encountered an error processing your image."
             )
@@ -270,7 +591,7 @@ class TelegramBot:
         context: ContextTypes.DEFAULT_TYPE,
     ) -> None:
         """Handle errors."""
-        logger.error(f"Update {update} caused error {context.error}", exc_info=context.error)
+        logger.error("Update %s caused error %s", update, context.error, exc_info=context.error)
         
         if update and update.effective_message:
             await update.effective_message.reply_text(
@@ -5,6 +5,8 @@ This module defines all custom types, enums, and type aliases used throughout
 the application. It serves as the single source of truth for type contracts.
 """
 
+from collections import deque
+from collections.abc import Sequence
 from enum import Enum
 from typing import Literal, TypedDict, Protocol
 from datetime import datetime
@@ -41,6 +43,7 @@ class Intent(str, Enum):
     """User intent categories."""
     CREATE_POST = "create_post"
     EDIT_IMAGE = "edit_image"
+    SCHEDULE_POST = "schedule_post"
     GENERAL = "general"
 
 
@@ -72,12 +75,31 @@ class MessageDict(TypedDict):
     content: str
 
 
+class CompletionRequest(TypedDict):
+    """A single chat completion request, as submitted in a batch."""
+    messages: Sequence[MessageDict]
+    temperature: float
+    max_tokens: int
+
+
+class RequestClassification(TypedDict):
+    """Intent and target platforms detected for a user message."""
+    intent: Literal["create_post", "edit_image", "schedule_post", "general"]
+    platforms: list[str]
+
+
+class ImageRequestClassification(TypedDict):
+    """Image intent and target platforms detected for an image caption."""
+    image_intent: Literal["edit_only", "post_only", "both"]
+    platforms: list[str]
+
+
 class ConversationContext(TypedDict):
     """Context information for a conversation."""
     conversation_id: ConversationID
     user_id: UserID
     chat_id: ChatID
-    history: list[MessageDict]
+    history: deque[MessageDict]
 
 
 class PlatformPostResult(TypedDict):
@@ -115,8 +137,23 @@ class PlatformAgent(Protocol):
     """Protocol for platform-specific content generation agents."""
     
     platform: Platform
+    system_prompt: str
+    temperature: float
+    max_tokens: int
+    
+    def build_messages(
+        self,
+        prompt: str,
+        history: Sequence[MessageDict],
+    ) -> Sequence[MessageDict]:
+        """Build the chat messages sent to the model for a post request."""
+        ...
+    
+    def finalize(self, post: str) -> str:
+        """Apply platform-specific post-processing to generated content."""
+        ...
     
-    async def create_post(self, prompt: str, history: list[MessageDict]) -> str:
+    async def create_post(self, prompt: str, history: Sequence[MessageDict]) -> str:
         """
         Create a platform-specific post.
         
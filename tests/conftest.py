@@ -3,11 +3,63 @@ Shared test fixtures and configuration.
 """
 
 import pytest
+from pytest_asyncio import is_async_test
+from contextlib import contextmanager
 from unittest.mock import AsyncMock, MagicMock
-from app.types import MessageDict
-from app.models.database import DatabaseManager, Base
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.types import ConversationID, MessageDict
+from app.models.database import Base, Conversation, DatabaseManager
+from app.agents import post_creator
+from app.services import openai_service
+from app.services.openai_service import get_openai_service
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import raiseload, sessionmaker
+from sqlalchemy.pool import StaticPool
+from tests.helpers import stream_chunks
+
+# Statement prefixes ignored by count_queries
+_TRANSACTION_STATEMENTS = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT")
+
+
+def pytest_collection_modifyitems(items):
+    """Run every async test in one session-wide event loop."""
+    session_loop = pytest.mark.asyncio(scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Ensure cached posts never leak between tests."""
+    post_creator._response_cache.clear()
+    if post_creator._semantic_cache is not None:
+        post_creator._semantic_cache.clear()
+    yield
+    post_creator._response_cache.clear()
+    if post_creator._semantic_cache is not None:
+        post_creator._semantic_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_classifier_cache():
+    """Ensure cached classifications never leak between tests."""
+    openai_service._classifier_cache.clear()
+    if openai_service._classifier_semantic_cache is not None:
+        openai_service._classifier_semantic_cache.clear()
+    yield
+    openai_service._classifier_cache.clear()
+    if openai_service._classifier_semantic_cache is not None:
+        openai_service._classifier_semantic_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_instances():
+    """Rebuild shared service and agent instances so tests can patch them."""
+    get_openai_service.cache_clear()
+    post_creator.get_platform_agents.cache_clear()
+    yield
+    get_openai_service.cache_clear()
+    post_creator.get_platform_agents.cache_clear()
 
 
 @pytest.fixture
@@ -21,12 +73,38 @@ def mock_openai_service(mock_openai_response):
     """Mock OpenAI service."""
     service = AsyncMock()
     service.complete = AsyncMock(return_value=mock_openai_response)
+    service.stream_complete = MagicMock(
+        side_effect=lambda *args, **kwargs: stream_chunks(mock_openai_response)
+    )
     service.analyze_intent = AsyncMock(return_value="create_post")
+    service.classify_request = AsyncMock(
+        return_value={"intent": "create_post", "platforms": ["linkedin"]}
+    )
     service.analyze_image_intent = AsyncMock(return_value="edit_only")
+    service.classify_image_request = AsyncMock(
+        return_value={"image_intent": "edit_only", "platforms": []}
+    )
     service.detect_platforms = AsyncMock(return_value=["linkedin"])
     return service
 
 
+@pytest.fixture
+def patched_platform_agents(monkeypatch):
+    """
+    Replace each platform agent class with a shared mock instance.
+    
+    Returns:
+        Mock agent instances keyed by class name
+    """
+    mocks = {
+        name: AsyncMock(temperature=0.7)
+        for name in ("LinkedInAgent", "XAgent", "InstagramAgent", "YouTubeAgent", "SchoolAgent")
+    }
+    for name, mock in mocks.items():
+        monkeypatch.setattr(f"app.agents.post_creator.{name}", lambda _mock=mock: _mock)
+    return mocks
+
+
 @pytest.fixture
 def sample_conversation_history() -> list[MessageDict]:
     """Sample conversation history for testing."""
@@ -37,19 +115,118 @@ def sample_conversation_history() -> list[MessageDict]:
     ]
 
 
-@pytest.fixture
-def test_db_manager():
-    """Create an in-memory test database."""
-    engine = create_engine("sqlite:///:memory:", echo=False)
+@pytest.fixture(scope="session")
+def test_engine():
+    """Create one in-memory test database, shared by every test."""
+    # One shared connection so worker threads see the same in-memory database
+    engine = create_engine(
+        "sqlite://",
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    
+    # Let SQLAlchemy emit BEGIN itself so pysqlite supports SAVEPOINT
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+    
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+    
     Base.metadata.create_all(bind=engine)
     
-    db_manager = DatabaseManager("sqlite:///:memory:", echo=False)
-    db_manager.engine = engine
-    db_manager.SessionLocal = sessionmaker(bind=engine)
+    yield engine
+    
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def test_db_manager(test_engine):
+    """
+    Database manager whose changes are rolled back after each test.
+    
+    Every session joins one outer transaction, and session commits only
+    release a SAVEPOINT, so the schema is built once per run.
+    """
+    connection = test_engine.connect()
+    transaction = connection.begin()
+    
+    db_manager = DatabaseManager("sqlite://", echo=False)
+    db_manager.engine = test_engine
+    db_manager.SessionLocal = sessionmaker(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+    )
     
     yield db_manager
     
-    Base.metadata.drop_all(bind=engine)
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture
+def conversation_id(test_db_manager) -> ConversationID:
+    """ID of a committed conversation for the test user and chat."""
+    with test_db_manager.get_session() as session:
+        conversation = Conversation(telegram_user_id=123, telegram_chat_id=456)
+        session.add(conversation)
+        session.commit()
+        return conversation.id
+
+
+@pytest.fixture
+def db_session(test_db_manager):
+    """Database session for the current test, closed afterwards."""
+    session = test_db_manager.get_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def no_lazy_loads(test_db_manager):
+    """
+    Make any relationship load that would emit SQL raise instead.
+    
+    Code under test must fetch what it needs in its own queries, so N+1
+    patterns fail loudly rather than issuing extra round-trips.
+    """
+    def _raiseload(orm_execute_state):
+        if orm_execute_state.is_select:
+            orm_execute_state.statement = orm_execute_state.statement.options(
+                raiseload("*", sql_only=True)
+            )
+    
+    event.listen(test_db_manager.SessionLocal, "do_orm_execute", _raiseload)
+    yield
+    event.remove(test_db_manager.SessionLocal, "do_orm_execute", _raiseload)
+
+
+@pytest.fixture
+def count_queries(test_engine):
+    """
+    Context manager collecting the SQL statements executed inside it.
+    
+    Transaction control (BEGIN, SAVEPOINT, RELEASE, ROLLBACK) is left
+    out, so counts reflect only the queries the code under test issues.
+    """
+    @contextmanager
+    def _count_queries():
+        statements: list[str] = []
+        
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            if not statement.lstrip().upper().startswith(_TRANSACTION_STATEMENTS):
+                statements.append(statement)
+        
+        event.listen(test_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(test_engine, "before_cursor_execute", _record)
+    
+    return _count_queries
 
 
 @pytest.fixture
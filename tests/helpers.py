@@ -0,0 +1,9 @@
+"""
+Helpers shared by the test modules.
+"""
+
+
+async def stream_chunks(*chunks: str):
+    """Yield chunks like a streaming OpenAI completion."""
+    for chunk in chunks:
+        yield chunk
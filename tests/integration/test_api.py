@@ -0,0 +1,85 @@
+"""
+Integration tests for the HTTP API.
+"""
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.main import app
+from app.services.openai_service import get_openai_service
+from app.types import Platform
+
+
+@pytest.fixture
+async def client():
+    """HTTP client calling the app in-process, without starting the bot."""
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://test",
+    ) as client:
+        yield client
+
+
+class TestPostsEndpoint:
+    """Test suite for POST /posts."""
+    
+    async def test_returns_posts_and_errors_per_platform(
+        self,
+        client,
+        patched_platform_agents,
+    ):
+        """Test that each platform's post or failure is reported in the response."""
+        x = patched_platform_agents["XAgent"]
+        x.platform = Platform.X
+        x.create_post.return_value = "X post"
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.platform = Platform.LINKEDIN
+        linkedin.create_post.side_effect = Exception("API Error")
+        
+        response = await client.post(
+            "/posts",
+            json={
+                "prompt": "Announce our launch",
+                "platforms": ["x", "linkedin"],
+                "history": [{"role": "user", "content": "We launch on Monday"}],
+            },
+        )
+        
+        assert response.status_code == 200
+        assert response.json() == {
+            "posts": {"x": "X post"},
+            "errors": {"linkedin": "API Error"},
+        }
+        assert list(x.create_post.call_args.args[1]) == [
+            {"role": "user", "content": "We launch on Monday"}
+        ]
+    
+    async def test_batch_requests_use_batch_api(self, client):
+        """Test that batch requests generate every platform in one Batch API job."""
+        service = get_openai_service()
+        
+        with patch.object(
+            service, "complete_batch", AsyncMock(return_value=["X post", "LinkedIn post"])
+        ) as complete_batch, patch.object(service, "complete", AsyncMock()) as complete:
+            response = await client.post(
+                "/posts",
+                json={
+                    "prompt": "Announce our launch",
+                    "platforms": ["x", "linkedin"],
+                    "batch": True,
+                },
+            )
+        
+        assert response.status_code == 200
+        assert set(response.json()["posts"]) == {"x", "linkedin"}
+        assert len(complete_batch.call_args.args[0]) == 2
+        complete.assert_not_called()
+    
+    async def test_rejects_unknown_platform(self, client):
+        """Test that platforms outside the Platform enum are a validation error."""
+        response = await client.post(
+            "/posts",
+            json={"prompt": "Announce our launch", "platforms": ["tiktok"]},
+        )
+        
+        assert response.status_code == 422
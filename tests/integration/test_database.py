@@ -3,43 +3,44 @@ Integration tests for database operations.
 """
 
 import pytest
-from app.models.database import Conversation, Message, ImageVersion, GeneratedPost
+from sqlalchemy import delete, event, insert, select, text
+from app.models.database import (
+    Conversation,
+    DatabaseManager,
+    GeneratedPost,
+    ImageVersion,
+    Message,
+)
+from app.telegram.bot import TelegramBot
 
 
+@pytest.mark.xdist_group("db")
 class TestDatabaseOperations:
     """Test suite for database operations."""
     
-    def test_create_conversation(self, test_db_manager):
+    def test_create_conversation(self, db_session):
         """Test creating a conversation."""
-        session = test_db_manager.get_session()
-        
         conversation = Conversation(
             telegram_user_id=123456,
             telegram_chat_id=789012,
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        db_session.add(conversation)
+        db_session.flush()
         
         assert conversation.id is not None
         assert conversation.telegram_user_id == 123456
         assert conversation.telegram_chat_id == 789012
         assert conversation.created_at is not None
-        
-        session.close()
     
-    def test_save_message(self, test_db_manager):
+    def test_save_message(self, db_session):
         """Test saving a message."""
-        session = test_db_manager.get_session()
-        
         # Create conversation first
         conversation = Conversation(
             telegram_user_id=123456,
             telegram_chat_id=789012,
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        db_session.add(conversation)
+        db_session.flush()
         
         # Create message
         message = Message(
@@ -48,30 +49,24 @@ class TestDatabaseOperations:
             content="Hello, world!",
             message_type="text",
         )
-        session.add(message)
-        session.commit()
-        session.refresh(message)
+        db_session.add(message)
+        db_session.flush()
         
         assert message.id is not None
         assert message.conversation_id == conversation.id
         assert message.role == "user"
         assert message.content == "Hello, world!"
         assert message.created_at is not None
-        
-        session.close()
     
-    def test_retrieve_conversation_history(self, test_db_manager):
+    def test_retrieve_conversation_history(self, db_session, count_queries):
         """Test retrieving conversation history."""
-        session = test_db_manager.get_session()
-        
         # Create conversation
         conversation = Conversation(
             telegram_user_id=123456,
             telegram_chat_id=789012,
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        db_session.add(conversation)
+        db_session.flush()
         
         # Add multiple messages
         messages_data = [
@@ -80,44 +75,46 @@ class TestDatabaseOperations:
             ("user", "Create a post"),
         ]
         
-        for role, content in messages_data:
-            message = Message(
-                conversation_id=conversation.id,
-                role=role,
-                content=content,
-                message_type="text",
-            )
-            session.add(message)
+        db_session.execute(
+            insert(Message),
+            [
+                {
+                    "conversation_id": conversation.id,
+                    "role": role,
+                    "content": content,
+                    "message_type": "text",
+                }
+                for role, content in messages_data
+            ],
+        )
+        db_session.commit()
         
-        session.commit()
+        conversation_id = conversation.id
         
         # Retrieve messages
-        retrieved_messages = (
-            session.query(Message)
-            .filter(Message.conversation_id == conversation.id)
-            .order_by(Message.created_at)
-            .all()
-        )
+        with count_queries() as queries:
+            retrieved_messages = (
+                db_session.query(Message)
+                .filter(Message.conversation_id == conversation_id)
+                .order_by(Message.created_at)
+                .all()
+            )
         
+        assert len(queries) == 1
         assert len(retrieved_messages) == 3
         assert retrieved_messages[0].content == "Hello"
         assert retrieved_messages[1].content == "Hi there!"
         assert retrieved_messages[2].content == "Create a post"
-        
-        session.close()
     
-    def test_save_image_version(self, test_db_manager):
+    def test_save_image_version(self, db_session):
         """Test saving an image version."""
-        session = test_db_manager.get_session()
-        
         # Create conversation
         conversation = Conversation(
             telegram_user_id=123456,
             telegram_chat_id=789012,
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        db_session.add(conversation)
+        db_session.flush()
         
         # Create image version
         image_version = ImageVersion(
@@ -130,29 +127,23 @@ class TestDatabaseOperations:
             edit_instruction="Change text to Hello",
             version_number=1,
         )
-        session.add(image_version)
-        session.commit()
-        session.refresh(image_version)
+        db_session.add(image_version)
+        db_session.flush()
         
         assert image_version.id is not None
         assert image_version.conversation_id == conversation.id
         assert image_version.version_number == 1
         assert image_version.edit_instruction == "Change text to Hello"
-        
-        session.close()
     
-    def test_cascade_delete(self, test_db_manager):
+    def test_cascade_delete(self, db_session):
         """Test that deleting a conversation cascades to related records."""
-        session = test_db_manager.get_session()
-        
         # Create conversation with messages
         conversation = Conversation(
             telegram_user_id=123456,
             telegram_chat_id=789012,
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        db_session.add(conversation)
+        db_session.flush()
         
         message = Message(
             conversation_id=conversation.id,
@@ -160,38 +151,33 @@ class TestDatabaseOperations:
             content="Test message",
             message_type="text",
         )
-        session.add(message)
-        session.commit()
+        db_session.add(message)
+        db_session.commit()
         
         conversation_id = conversation.id
         
         # Delete conversation
-        session.delete(conversation)
-        session.commit()
+        db_session.delete(conversation)
+        db_session.commit()
         
         # Verify messages are also deleted
         remaining_messages = (
-            session.query(Message)
+            db_session.query(Message)
             .filter(Message.conversation_id == conversation_id)
             .all()
         )
         
         assert len(remaining_messages) == 0
-        
-        session.close()
     
-    def test_save_generated_post(self, test_db_manager):
+    def test_save_generated_post(self, db_session):
         """Test saving a generated post."""
-        session = test_db_manager.get_session()
-        
         # Create conversation
         conversation = Conversation(
             telegram_user_id=123456,
             telegram_chat_id=789012,
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        db_session.add(conversation)
+        db_session.flush()
         
         # Create generated post
         post = GeneratedPost(
@@ -200,12 +186,102 @@ class TestDatabaseOperations:
             content="This is a LinkedIn post about AI automation.",
             prompt="Create a LinkedIn post about AI",
         )
-        session.add(post)
-        session.commit()
-        session.refresh(post)
+        db_session.add(post)
+        db_session.flush()
         
         assert post.id is not None
         assert post.platform == "linkedin"
         assert "AI automation" in post.content
+    
+    async def test_get_or_create_conversation_upserts_once(self, test_db_manager, db_session):
+        """Test that repeated lookups for a chat share one conversation row."""
+        bot = TelegramBot(test_db_manager)
+        
+        first = await bot._get_or_create_conversation(123456, 789012)
+        bot._conversation_ids.clear()
+        second = await bot._get_or_create_conversation(123456, 789012)
+        other = await bot._get_or_create_conversation(123456, 111111)
+        
+        count = db_session.query(Conversation).count()
+        
+        assert first == second
+        assert other != first
+        assert count == 2
+    
+    async def test_cached_conversation_lookup_skips_database(
+        self,
+        test_db_manager,
+        count_queries,
+    ):
+        """Test that a chat seen before is resolved without any query."""
+        bot = TelegramBot(test_db_manager)
+        first = await bot._get_or_create_conversation(123456, 789012)
+        
+        with count_queries() as queries:
+            second = await bot._get_or_create_conversation(123456, 789012)
+        
+        assert second == first
+        assert queries == []
+    
+    async def test_save_user_message_revalidates_deleted_conversation(self, tmp_path, caplog):
+        """Test that a cached ID whose conversation was deleted is looked up again."""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'bot.db'}", echo=False)
+        
+        # SQLite only checks foreign keys when asked to
+        @event.listens_for(db_manager.engine, "connect")
+        def _enforce_foreign_keys(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA foreign_keys = ON")
+        
+        db_manager.create_tables()
+        bot = TelegramBot(db_manager)
+        await bot._save_user_message(123, 456, "Hello")
+        
+        with db_manager.get_session() as session:
+            session.execute(delete(Conversation))
+            session.commit()
+        
+        conversation_id = await bot._save_user_message(123, 456, "Hello again")
+        
+        with db_manager.get_session() as session:
+            contents = session.scalars(
+                select(Message.content).where(Message.conversation_id == conversation_id)
+            ).all()
+        
+        assert "no longer exists" in caplog.text
+        assert bot._conversation_ids[(123, 456)] == conversation_id
+        assert contents == ["Hello again"]
+    
+    async def test_create_tables_migrates_legacy_conversations(self, tmp_path):
+        """Test that a conversations table predating the unique index is upgraded."""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'legacy.db'}", echo=False)
+        with db_manager.engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE conversations ("
+                "id INTEGER PRIMARY KEY, "
+                "telegram_user_id INTEGER NOT NULL, "
+                "telegram_chat_id INTEGER NOT NULL, "
+                "created_at DATETIME NOT NULL)"
+            ))
+            connection.execute(text(
+                "INSERT INTO conversations VALUES "
+                "(1, 123, 456, '2024-01-01'), (2, 123, 456, '2024-01-02')"
+            ))
+        Message.__table__.create(db_manager.engine)
+        with db_manager.engine.begin() as connection:
+            connection.execute(insert(Message), [{
+                "conversation_id": 2,
+                "role": "user",
+                "content": "Hello",
+                "message_type": "text",
+            }])
+        
+        db_manager.create_tables()
+        
+        bot = TelegramBot(db_manager)
+        conversation_id = await bot._get_or_create_conversation(123, 456)
         
-        session.close()
+        with db_manager.get_session() as session:
+            assert session.query(Conversation.id).all() == [(1,)]
+            assert session.query(Message.conversation_id).all() == [(1,)]
+        assert conversation_id == 1
+        db_manager.engine.dispose()
@@ -0,0 +1,159 @@
+"""
+Unit tests for OpenAI service.
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.config import get_settings
+from app.services.openai_service import OpenAIService
+from app.services.semantic_cache import SemanticCache
+
+
+class TestDetectPlatforms:
+    """Test suite for platform detection parsing."""
+    
+    async def test_aliases_mapped_and_unknown_platforms_dropped(self):
+        """Test that twitter maps to x and unsupported platforms are ignored."""
+        service = OpenAIService()
+        
+        with patch.object(
+            service,
+            "complete",
+            AsyncMock(return_value=" Twitter, LinkedIn, tiktok"),
+        ):
+            platforms = await service.detect_platforms("Post this on Twitter and LinkedIn")
+        
+        assert platforms == ["x", "linkedin"]
+
+
+class TestClassifyIntent:
+    """Test suite for intent label parsing."""
+    
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [("create_post", "create_post"), (" Post.", "create_post"), ("'edit'", "edit_image")],
+    )
+    async def test_intent_variants_mapped_to_canonical_label(self, raw, expected):
+        """Test that common label variants from the model are accepted."""
+        service = OpenAIService()
+        
+        with patch.object(service, "complete", AsyncMock(return_value=raw)):
+            intent = await service.analyze_intent("Make something", [])
+        
+        assert intent == expected
+
+
+class TestClassifierCache:
+    """Test suite for classifier result caching."""
+    
+    async def test_identical_input_served_from_cache(self):
+        """Test that repeated classification of the same input calls the API once."""
+        service = OpenAIService()
+        
+        with patch.object(service, "complete", AsyncMock(return_value="linkedin,x")) as complete:
+            first = await service.detect_platforms("Create a LinkedIn and X post")
+            second = await service.detect_platforms("  create a linkedin and x post ")
+        
+        assert first == second == ["linkedin", "x"]
+        complete.assert_called_once()
+        assert complete.call_args.kwargs["temperature"] == 0.0
+        assert complete.call_args.kwargs["model"] == get_settings().OPENAI_CLASSIFIER_MODEL
+    
+    async def test_failed_classification_not_cached(self):
+        """Test that a fallback result after an API error is not reused."""
+        service = OpenAIService()
+        
+        with patch.object(
+            service,
+            "complete",
+            AsyncMock(side_effect=[Exception("API Error"), "post_only"]),
+        ) as complete:
+            first = await service.analyze_image_intent("Write a post about this")
+            second = await service.analyze_image_intent("Write a post about this")
+        
+        assert first == "edit_only"
+        assert second == "post_only"
+        assert complete.call_count == 2
+    
+    async def test_history_is_part_of_cache_key(self):
+        """Test that the same text with different context is classified again."""
+        service = OpenAIService()
+        
+        with patch.object(service, "complete", AsyncMock(return_value="general")) as complete:
+            await service.analyze_intent("Yes", [{"role": "assistant", "content": "Post it?"}])
+            await service.analyze_intent("Yes", [{"role": "assistant", "content": "Hello!"}])
+        
+        assert complete.call_count == 2
+    
+    async def test_semantic_reuse_limited_to_intent_labels(self):
+        """Test that paraphrases reuse intents but never another prompt's platforms."""
+        service = OpenAIService()
+        
+        with patch(
+            "app.services.openai_service._classifier_semantic_cache",
+            SemanticCache(dimensions=2),
+        ), patch.object(service, "embed", AsyncMock(return_value=[1.0, 0.0])), patch.object(
+            service, "complete", AsyncMock(side_effect=["create_post", "linkedin", "x"])
+        ) as complete:
+            assert await service.analyze_intent("LinkedIn post about AI", []) == "create_post"
+            assert await service.analyze_intent("X post about AI", []) == "create_post"
+            assert await service.detect_platforms("LinkedIn post about AI") == ["linkedin"]
+            assert await service.detect_platforms("X post about AI") == ["x"]
+        
+        assert complete.call_count == 3
+
+
+class TestClassifierBatching:
+    """Test suite for coalescing concurrent request classifications."""
+    
+    async def test_concurrent_requests_share_one_completion(self):
+        """Test that concurrent classify_request calls are sent as one batch."""
+        batch_settings = get_settings().model_copy(update={"CLASSIFIER_BATCHING_ENABLED": True})
+        output = {
+            "results": [
+                {"id": 0, "intent": "create_post", "platforms": ["linkedin"]},
+                {"id": 1, "intent": "general", "platforms": []},
+            ]
+        }
+        
+        with patch("app.services.openai_service.settings", batch_settings):
+            service = OpenAIService()
+        
+        with patch.object(
+            service,
+            "complete",
+            AsyncMock(return_value=json.dumps(output)),
+        ) as complete:
+            first, second = await asyncio.gather(
+                service.classify_request("Write a LinkedIn post", []),
+                service.classify_request("Hello there", []),
+            )
+        
+        complete.assert_called_once()
+        assert first == {"intent": "create_post", "platforms": ["linkedin"]}
+        assert second == {"intent": "general", "platforms": []}
+    
+    async def test_items_missing_from_batch_are_classified_individually(self):
+        """Test that messages the batch response omits fall back to single calls."""
+        batch_settings = get_settings().model_copy(update={"CLASSIFIER_BATCHING_ENABLED": True})
+        batch_output = {"results": [{"id": 0, "intent": "general", "platforms": []}]}
+        single_output = {"intent": "create_post", "platforms": ["x"]}
+        
+        with patch("app.services.openai_service.settings", batch_settings):
+            service = OpenAIService()
+        
+        with patch.object(
+            service,
+            "complete",
+            AsyncMock(side_effect=[json.dumps(batch_output), json.dumps(single_output)]),
+        ) as complete:
+            first, second = await asyncio.gather(
+                service.classify_request("Hello there", []),
+                service.classify_request("Write an X post", []),
+            )
+        
+        assert complete.call_count == 2
+        assert first["intent"] == "general"
+        assert second == {"intent": "create_post", "platforms": ["x"]}
@@ -2,8 +2,10 @@
 Unit tests for platform-specific agents.
 """
 
+import hashlib
+import json
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import patch
 from app.agents.platform_agents.linkedin_agent import LinkedInAgent
 from app.agents.platform_agents.x_agent import XAgent
 from app.agents.platform_agents.instagram_agent import InstagramAgent
@@ -14,7 +16,6 @@ from app.agents.platform_agents.school_agent import SchoolAgent
 class TestLinkedInAgent:
     """Test suite for LinkedInAgent."""
     
-    @pytest.mark.asyncio
     async def test_creates_post_with_correct_tone(
         self,
         mock_openai_service,
@@ -22,10 +23,10 @@ class TestLinkedInAgent:
     ):
         """Test that LinkedIn posts have professional tone."""
         mock_response = "Here's a professional LinkedIn post about AI automation..."
-        mock_openai_service.complete = AsyncMock(return_value=mock_response)
+        mock_openai_service.complete.return_value = mock_response
         
         with patch(
-            "app.agents.platform_agents.linkedin_agent.OpenAIService",
+            "app.agents.platform_agents.linkedin_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = LinkedInAgent()
@@ -37,13 +38,12 @@ class TestLinkedInAgent:
             assert post == mock_response
             mock_openai_service.complete.assert_called_once()
     
-    @pytest.mark.asyncio
     async def test_handles_api_failure(self, mock_openai_service, sample_conversation_history):
         """Test error handling when OpenAI API fails."""
-        mock_openai_service.complete = AsyncMock(side_effect=Exception("API Error"))
+        mock_openai_service.complete.side_effect = Exception("API Error")
         
         with patch(
-            "app.agents.platform_agents.linkedin_agent.OpenAIService",
+            "app.agents.platform_agents.linkedin_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = LinkedInAgent()
@@ -55,7 +55,6 @@ class TestLinkedInAgent:
 class TestXAgent:
     """Test suite for XAgent."""
     
-    @pytest.mark.asyncio
     async def test_respects_character_limits(
         self,
         mock_openai_service,
@@ -63,10 +62,10 @@ class TestXAgent:
     ):
         """Test that X posts are under 280 characters."""
         mock_response = "A" * 300  # Intentionally too long
-        mock_openai_service.complete = AsyncMock(return_value=mock_response)
+        mock_openai_service.complete.return_value = mock_response
         
         with patch(
-            "app.agents.platform_agents.x_agent.OpenAIService",
+            "app.agents.platform_agents.x_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = XAgent()
@@ -77,7 +76,6 @@ class TestXAgent:
             
             assert len(post) <= 280
     
-    @pytest.mark.asyncio
     async def test_creates_concise_post(
         self,
         mock_openai_service,
@@ -85,10 +83,10 @@ class TestXAgent:
     ):
         """Test that X posts are concise."""
         mock_response = "AI automation is transforming how we work. #AI #Automation"
-        mock_openai_service.complete = AsyncMock(return_value=mock_response)
+        mock_openai_service.complete.return_value = mock_response
         
         with patch(
-            "app.agents.platform_agents.x_agent.OpenAIService",
+            "app.agents.platform_agents.x_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = XAgent()
@@ -104,7 +102,6 @@ class TestXAgent:
 class TestInstagramAgent:
     """Test suite for InstagramAgent."""
     
-    @pytest.mark.asyncio
     async def test_creates_visual_caption(
         self,
         mock_openai_service,
@@ -112,10 +109,10 @@ class TestInstagramAgent:
     ):
         """Test that Instagram captions are visual-focused."""
         mock_response = "✨ Amazing sunset vibes 🌅\n\n#sunset #travel"
-        mock_openai_service.complete = AsyncMock(return_value=mock_response)
+        mock_openai_service.complete.return_value = mock_response
         
         with patch(
-            "app.agents.platform_agents.instagram_agent.OpenAIService",
+            "app.agents.platform_agents.instagram_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = InstagramAgent()
@@ -130,7 +127,6 @@ class TestInstagramAgent:
 class TestYouTubeAgent:
     """Test suite for YouTubeAgent."""
     
-    @pytest.mark.asyncio
     async def test_creates_title_and_description(
         self,
         mock_openai_service,
@@ -138,10 +134,10 @@ class TestYouTubeAgent:
     ):
         """Test that YouTube content includes title and description."""
         mock_response = "**Title:** Amazing Python Tutorial\n\n**Description:** Learn Python..."
-        mock_openai_service.complete = AsyncMock(return_value=mock_response)
+        mock_openai_service.complete.return_value = mock_response
         
         with patch(
-            "app.agents.platform_agents.youtube_agent.OpenAIService",
+            "app.agents.platform_agents.youtube_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = YouTubeAgent()
@@ -157,7 +153,6 @@ class TestYouTubeAgent:
 class TestSchoolAgent:
     """Test suite for SchoolAgent."""
     
-    @pytest.mark.asyncio
     async def test_creates_community_post(
         self,
         mock_openai_service,
@@ -165,10 +160,10 @@ class TestSchoolAgent:
     ):
         """Test that School posts are community-focused."""
         mock_response = "Hey everyone! Let's discuss AI automation."
-        mock_openai_service.complete = AsyncMock(return_value=mock_response)
+        mock_openai_service.complete.return_value = mock_response
         
         with patch(
-            "app.agents.platform_agents.school_agent.OpenAIService",
+            "app.agents.platform_agents.school_agent.get_openai_service",
             return_value=mock_openai_service,
         ):
             agent = SchoolAgent()
@@ -179,3 +174,45 @@ class TestSchoolAgent:
             
             # Should add signature if not present
             assert "Love an automation" in post
+
+
+class TestSystemPromptPrefix:
+    """Test suite for the static system-prompt prefix shared by all agents."""
+    
+    @pytest.mark.parametrize(
+        "module, agent_cls",
+        [
+            ("linkedin_agent", LinkedInAgent),
+            ("x_agent", XAgent),
+            ("instagram_agent", InstagramAgent),
+            ("youtube_agent", YouTubeAgent),
+            ("school_agent", SchoolAgent),
+        ],
+    )
+    async def test_system_message_is_byte_identical_across_calls(
+        self,
+        module,
+        agent_cls,
+        mock_openai_service,
+        sample_conversation_history,
+    ):
+        """Test that the system message prefix never changes between requests."""
+        with patch(
+            f"app.agents.platform_agents.{module}.get_openai_service",
+            return_value=mock_openai_service,
+        ):
+            agent = agent_cls()
+            await agent.create_post("First prompt", sample_conversation_history)
+            await agent.create_post("Second prompt", sample_conversation_history[:1])
+        
+        digests = {
+            hashlib.sha256(json.dumps(call.args[0][0]).encode()).hexdigest()
+            for call in mock_openai_service.complete.call_args_list
+        }
+        
+        assert len(digests) == 1
+        assert mock_openai_service.complete.call_args_list[0].args[0][0]["role"] == "system"
+        assert {
+            call.kwargs["cache_key"]
+            for call in mock_openai_service.complete.call_args_list
+        } == {f"agent:{agent.platform.value}"}
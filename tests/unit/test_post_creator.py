@@ -2,75 +2,99 @@
 Unit tests for Post Creator Agent.
 """
 
+import asyncio
+import json
 import pytest
-from unittest.mock import AsyncMock, patch
-from app.agents.post_creator import PostCreatorAgent
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.agents.post_creator import PostCreatorAgent, _DISPLAY_NAMES, get_platform_agents
+from app.services.openai_service import OpenAIService, get_openai_service
+from app.services.semantic_cache import SemanticCache
+from app.config import get_settings
+from app.types import Platform
 
 
 class TestPostCreatorAgent:
     """Test suite for PostCreatorAgent."""
     
-    @pytest.mark.asyncio
+    def test_every_platform_has_display_name(self):
+        """Test that each platform agent key maps to a display name."""
+        assert set(get_platform_agents()) == set(_DISPLAY_NAMES)
+    
+    def test_twitter_alias_shares_x_agent(self):
+        """Test that the twitter alias reuses the X agent instance."""
+        agents = get_platform_agents()
+        assert agents["twitter"] is agents["x"]
+    
+    def test_instances_share_platform_agents(self, mock_openai_service):
+        """Test that platform agents are built once, not per PostCreatorAgent."""
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            assert PostCreatorAgent().agents is PostCreatorAgent().agents
+    
     async def test_detect_single_platform(
         self,
         mock_openai_service,
+        patched_platform_agents,
         sample_conversation_history,
     ):
         """Test detection of a single platform."""
         mock_openai_service.detect_platforms = AsyncMock(return_value=["linkedin"])
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.create_post.return_value = "LinkedIn post content"
         
-        with patch("app.agents.post_creator.OpenAIService", return_value=mock_openai_service):
-            with patch("app.agents.post_creator.LinkedInAgent") as mock_linkedin:
-                mock_linkedin_instance = AsyncMock()
-                mock_linkedin_instance.create_post = AsyncMock(
-                    return_value="LinkedIn post content"
-                )
-                mock_linkedin.return_value = mock_linkedin_instance
-                
-                agent = PostCreatorAgent()
-                response = await agent.create_posts(
-                    "Create a LinkedIn post",
-                    sample_conversation_history,
-                )
-                
-                assert "LinkedIn" in response
-                assert "LinkedIn post content" in response
-                mock_linkedin_instance.create_post.assert_called_once()
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.create_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+            )
+            
+            assert "LinkedIn" in response
+            assert "LinkedIn post content" in response
+            linkedin.create_post.assert_called_once()
     
-    @pytest.mark.asyncio
     async def test_detect_multiple_platforms(
         self,
         mock_openai_service,
+        patched_platform_agents,
         sample_conversation_history,
     ):
         """Test detection of multiple platforms."""
         mock_openai_service.detect_platforms = AsyncMock(return_value=["x", "linkedin"])
+        x = patched_platform_agents["XAgent"]
+        x.create_post.return_value = "X post"
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.create_post.return_value = "LinkedIn post"
         
-        with patch("app.agents.post_creator.OpenAIService", return_value=mock_openai_service):
-            with patch("app.agents.post_creator.XAgent") as mock_x:
-                with patch("app.agents.post_creator.LinkedInAgent") as mock_linkedin:
-                    mock_x_instance = AsyncMock()
-                    mock_x_instance.create_post = AsyncMock(return_value="X post")
-                    mock_x.return_value = mock_x_instance
-                    
-                    mock_linkedin_instance = AsyncMock()
-                    mock_linkedin_instance.create_post = AsyncMock(
-                        return_value="LinkedIn post"
-                    )
-                    mock_linkedin.return_value = mock_linkedin_instance
-                    
-                    agent = PostCreatorAgent()
-                    response = await agent.create_posts(
-                        "Create posts for X and LinkedIn",
-                        sample_conversation_history,
-                    )
-                    
-                    assert "X" in response
-                    assert "LinkedIn" in response
-                    mock_x_instance.create_post.assert_called_once()
-                    mock_linkedin_instance.create_post.assert_called_once()
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.create_posts(
+                "Create posts for X and LinkedIn",
+                sample_conversation_history,
+            )
+            
+            assert "X" in response
+            assert "LinkedIn" in response
+            x.create_post.assert_called_once()
+            linkedin.create_post.assert_called_once()
+    
+    async def test_detect_cached_on_repeat(
+        self,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that a repeated prompt reuses the detected platforms."""
+        service = OpenAIService()
+        patched_platform_agents["LinkedInAgent"].create_post.return_value = "LinkedIn post"
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=service):
+            with patch.object(service, "complete", AsyncMock(return_value="linkedin")) as complete:
+                agent = PostCreatorAgent()
+                for prompt in ("Create a LinkedIn post", "create a LinkedIn post "):
+                    response = await agent.create_posts(prompt, sample_conversation_history)
+                    assert "LinkedIn post" in response
+                
+                complete.assert_called_once()
     
-    @pytest.mark.asyncio
     async def test_detect_no_platform(
         self,
         mock_openai_service,
@@ -79,7 +103,7 @@ class TestPostCreatorAgent:
         """Test handling when no platform is detected."""
         mock_openai_service.detect_platforms = AsyncMock(return_value=[])
         
-        with patch("app.agents.post_creator.OpenAIService", return_value=mock_openai_service):
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
             agent = PostCreatorAgent()
             response = await agent.create_posts(
                 "Hello",
@@ -89,29 +113,410 @@ class TestPostCreatorAgent:
             assert "platform" in response.lower()
             assert "X" in response or "LinkedIn" in response
     
-    @pytest.mark.asyncio
+    async def test_given_platforms_skip_detection(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that platforms passed by the caller are not detected again."""
+        patched_platform_agents["LinkedInAgent"].create_post.return_value = (
+            "LinkedIn post content"
+        )
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.create_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+                platforms=["linkedin"],
+            )
+            
+            assert "LinkedIn post content" in response
+            mock_openai_service.detect_platforms.assert_not_called()
+    
+    async def test_agents_receive_trimmed_history(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+    ):
+        """Test that history is trimmed once before reaching the agents."""
+        history = [{"role": "user", "content": f"Message {i}"} for i in range(6)]
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.create_post.return_value = "LinkedIn post content"
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            await agent.create_posts("Create a LinkedIn post", history)
+            
+            passed = linkedin.create_post.call_args.args[1]
+            assert list(passed) == history[-3:]
+    
     async def test_handles_platform_agent_failure(
         self,
         mock_openai_service,
+        patched_platform_agents,
         sample_conversation_history,
     ):
-        """Test handling when a platform agent fails."""
+        """Test that one failing agent does not stop the other platforms."""
+        mock_openai_service.detect_platforms = AsyncMock(return_value=["linkedin", "x"])
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.create_post.side_effect = Exception("API Error")
+        x = patched_platform_agents["XAgent"]
+        x.create_post.return_value = "X post"
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.create_posts(
+                "Create posts for LinkedIn and X",
+                sample_conversation_history,
+            )
+            
+            # Both agents ran; the failure is reported next to the other post
+            linkedin.create_post.assert_awaited_once()
+            x.create_post.assert_awaited_once()
+            assert "❌ **LinkedIn**: Error generating post" in response
+            assert "📱 **X**\nX post" in response
+    
+    async def test_generate_posts_splits_posts_and_errors(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+    ):
+        """Test that structured generation reports each platform's post or error."""
+        x = patched_platform_agents["XAgent"]
+        x.platform = Platform.X
+        x.create_post.return_value = "X post"
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.platform = Platform.LINKEDIN
+        linkedin.create_post.side_effect = Exception("API Error")
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.generate_posts(
+                "Announce our launch",
+                [],
+                ["x", "twitter", "linkedin", "tiktok"],
+            )
+            
+            assert response.posts == {Platform.X: "X post"}
+            assert response.errors == {Platform.LINKEDIN: "API Error"}
+            x.create_post.assert_called_once()  # x and twitter share one generation
+    
+    async def test_repeated_request_served_from_cache(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that an identical request to a low-temperature agent reuses the cached post."""
         mock_openai_service.detect_platforms = AsyncMock(return_value=["linkedin"])
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.temperature = 0.2
+        linkedin.create_post.return_value = "LinkedIn post content"
         
-        with patch("app.agents.post_creator.OpenAIService", return_value=mock_openai_service):
-            with patch("app.agents.post_creator.LinkedInAgent") as mock_linkedin:
-                mock_linkedin_instance = AsyncMock()
-                mock_linkedin_instance.create_post = AsyncMock(
-                    side_effect=Exception("API Error")
-                )
-                mock_linkedin.return_value = mock_linkedin_instance
-                
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            first = await agent.create_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+            )
+            second = await agent.create_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+            )
+            
+            assert first == second
+            linkedin.create_post.assert_called_once()
+            
+            await agent.create_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+                regenerate=True,
+            )
+            assert linkedin.create_post.call_count == 2
+    
+    async def test_sampled_posts_not_cached(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that agents sampling at the default 0.7 produce a fresh post each time."""
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.create_post.return_value = "LinkedIn post content"
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            for _ in range(2):
+                await agent.create_posts("Create a LinkedIn post", sample_conversation_history)
+            
+            assert linkedin.create_post.call_count == 2
+    
+    async def test_default_youtube_agent_is_cached(self, sample_conversation_history):
+        """Test that the shipped YouTube agent is under the cache ceiling and gets reused."""
+        service = OpenAIService()
+        youtube = get_platform_agents()["youtube"]
+        assert youtube.temperature <= get_settings().RESPONSE_CACHE_MAX_TEMPERATURE
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=service):
+            with patch.object(
+                youtube.openai, "complete", AsyncMock(return_value="YouTube post")
+            ) as complete:
                 agent = PostCreatorAgent()
-                response = await agent.create_posts(
+                for regenerate in (False, False, True):
+                    await agent.create_posts(
+                        "Create a YouTube description for our launch video",
+                        sample_conversation_history,
+                        regenerate=regenerate,
+                        platforms=["youtube"],
+                    )
+                
+                assert complete.call_count == 2
+    
+    async def test_concurrent_identical_requests_share_generation(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that duplicate in-flight requests wait on one uncached generation."""
+        may_finish = asyncio.Event()
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        
+        async def slow_post(prompt, history):
+            await may_finish.wait()
+            return "LinkedIn post"
+        
+        linkedin.create_post = AsyncMock(side_effect=slow_post)
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            requests = [
+                asyncio.ensure_future(agent.create_posts(
                     "Create a LinkedIn post",
                     sample_conversation_history,
-                )
+                    regenerate=regenerate,
+                    platforms=["linkedin"],
+                ))
+                for regenerate in (False, False, False, True)
+            ]
+            await asyncio.sleep(0.01)
+            requests.pop(0).cancel()  # Leaving early doesn't cancel the others' post
+            may_finish.set()
+            responses = await asyncio.gather(*requests)
+            
+            assert all("LinkedIn post" in response for response in responses)
+            assert linkedin.create_post.await_count == 2  # Shared one plus regenerate
+            
+            await agent.create_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+                platforms=["linkedin"],
+            )
+            assert linkedin.create_post.await_count == 3  # Finished posts aren't reused
+    
+    @pytest.mark.parametrize(
+        "second_embedding, same_request, expected_calls",
+        [
+            ([1.0, 0.0], False, 1),  # Above hit threshold: served from cache
+            ([0.9, 0.436], True, 1),  # Gray zone, confirmed: served from cache
+            ([0.9, 0.436], False, 2),  # Gray zone, rejected: regenerated
+            ([0.0, 1.0], True, 2),  # Unrelated: regenerated
+        ],
+    )
+    async def test_paraphrased_request_uses_semantic_cache(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+        second_embedding,
+        same_request,
+        expected_calls,
+    ):
+        """Test that similar prompts are served from the semantic cache."""
+        mock_openai_service.detect_platforms = AsyncMock(return_value=["linkedin"])
+        mock_openai_service.embed = AsyncMock(side_effect=[[1.0, 0.0], second_embedding])
+        mock_openai_service.is_same_request = AsyncMock(return_value=same_request)
+        linkedin = patched_platform_agents["LinkedInAgent"]
+        linkedin.temperature = 0.2
+        linkedin.create_post.return_value = "LinkedIn post content"
+        
+        with patch(
+            "app.agents.post_creator.get_openai_service",
+            return_value=mock_openai_service,
+        ), patch("app.agents.post_creator._semantic_cache", SemanticCache(dimensions=2)):
+            agent = PostCreatorAgent()
+            await agent.create_posts(
+                "Write a LinkedIn post about AI",
+                sample_conversation_history,
+            )
+            await agent.create_posts(
+                "LinkedIn post about artificial intelligence",
+                sample_conversation_history,
+            )
+            
+            assert linkedin.create_post.call_count == expected_calls
+    
+    async def test_default_youtube_agent_uses_semantic_cache(self, sample_conversation_history):
+        """Test that the shipped YouTube agent is served from the semantic cache."""
+        service = get_openai_service()
+        youtube = get_platform_agents()["youtube"]
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=service), patch(
+            "app.agents.post_creator._semantic_cache", SemanticCache(dimensions=2)
+        ), patch.object(service, "embed", AsyncMock(return_value=[1.0, 0.0])) as embed:
+            with patch.object(
+                youtube.openai, "complete", AsyncMock(return_value="YouTube post")
+            ) as complete:
+                agent = PostCreatorAgent()
+                for prompt in ("YouTube description about AI", "YouTube text on AI"):
+                    response = await agent.create_posts(
+                        prompt,
+                        sample_conversation_history,
+                        platforms=["youtube"],
+                    )
+                    assert "YouTube post" in response
                 
-                # Should still return a response with error indication
-                assert "linkedin" in response.lower()
-                assert "❌" in response or "Error" in response
+                assert embed.await_count == 2
+                complete.assert_called_once()
+    
+    async def test_streams_posts_in_completion_order(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that the fastest platform is yielded before slower ones."""
+        mock_openai_service.detect_platforms = AsyncMock(return_value=["linkedin", "x"])
+        linkedin_may_finish = asyncio.Event()
+        
+        async def slow_linkedin_post(prompt, history):
+            await linkedin_may_finish.wait()
+            return "LinkedIn post"
+        
+        patched_platform_agents["XAgent"].create_post.return_value = "X post"
+        patched_platform_agents["LinkedInAgent"].create_post = slow_linkedin_post
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            stream = agent.stream_posts(
+                "Create posts for LinkedIn and X",
+                sample_conversation_history,
+            )
+            
+            header = await anext(stream)
+            first = await anext(stream)
+            linkedin_may_finish.set()
+            rest = [part async for part in stream]
+            
+            assert "Generated Posts" in header
+            assert "X post" in first
+            assert len(rest) == 1
+            assert "LinkedIn post" in rest[0]
+    
+    async def test_closing_at_header_cancels_generations(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+        sample_conversation_history,
+    ):
+        """Test that closing the stream right after the header cancels generations."""
+        cancelled = asyncio.Event()
+        
+        async def never_finishes(prompt, history):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        
+        patched_platform_agents["LinkedInAgent"].create_post = never_finishes
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            stream = agent.stream_posts(
+                "Create a LinkedIn post",
+                sample_conversation_history,
+                platforms=["linkedin"],
+            )
+            
+            assert "Generated Posts" in await anext(stream)
+            await asyncio.sleep(0.01)  # Let the generation start
+            await stream.aclose()
+            await asyncio.wait_for(cancelled.wait(), timeout=1)
+    
+    async def test_batch_mode_submits_single_batch(self, mock_openai_service):
+        """Test that batch mode generates all platforms in one Batch API job."""
+        mock_openai_service.complete_batch = AsyncMock(return_value=["X post", None])
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.generate_posts(
+                "Schedule posts for X and LinkedIn",
+                [],
+                ["x", "linkedin"],
+                batch=True,
+            )
+            
+            requests = mock_openai_service.complete_batch.call_args.args[0]
+            assert len(requests) == 2
+            assert requests[0]["max_tokens"] == 150
+            assert response.posts == {Platform.X: "X post"}
+            assert list(response.errors) == [Platform.LINKEDIN]
+            mock_openai_service.complete.assert_not_called()
+    
+    async def test_batch_failure_falls_back_to_parallel(
+        self,
+        mock_openai_service,
+        patched_platform_agents,
+    ):
+        """Test that a failed batch still produces posts via parallel requests."""
+        mock_openai_service.complete_batch = AsyncMock(side_effect=TimeoutError("slow"))
+        for name, platform, post in (
+            ("XAgent", Platform.X, "X post"),
+            ("LinkedInAgent", Platform.LINKEDIN, "LinkedIn post"),
+        ):
+            platform_agent = patched_platform_agents[name]
+            platform_agent.platform = platform
+            platform_agent.build_messages = MagicMock(return_value=[])
+            platform_agent.create_post.return_value = post
+        
+        with patch("app.agents.post_creator.get_openai_service", return_value=mock_openai_service):
+            agent = PostCreatorAgent()
+            response = await agent.generate_posts(
+                "Schedule posts for X and LinkedIn",
+                [],
+                ["x", "linkedin"],
+                batch=True,
+            )
+            
+            assert response.posts == {Platform.X: "X post", Platform.LINKEDIN: "LinkedIn post"}
+            assert response.errors == {}
+    
+    async def test_fused_mode_generates_all_platforms_in_one_call(
+        self,
+        mock_openai_service,
+        sample_conversation_history,
+    ):
+        """Test that fused mode makes one JSON completion for all platforms."""
+        mock_openai_service.detect_platforms = AsyncMock(return_value=["x", "linkedin"])
+        mock_openai_service.complete = AsyncMock(
+            return_value=json.dumps({"x": "X post", "linkedin": "LinkedIn post"})
+        )
+        fused_settings = get_settings().model_copy(update={"FUSED_POST_GENERATION": True})
+        
+        with patch(
+            "app.agents.post_creator.get_openai_service",
+            return_value=mock_openai_service,
+        ), patch("app.agents.post_creator.settings", fused_settings):
+            agent = PostCreatorAgent()
+            response = await agent.create_posts(
+                "Create posts for X and LinkedIn",
+                sample_conversation_history,
+            )
+            
+            mock_openai_service.complete.assert_called_once()
+            assert mock_openai_service.complete.call_args.kwargs["json_mode"] is True
+            assert "📱 **X**\nX post" in response
+            assert "📱 **LinkedIn**\nLinkedIn post" in response
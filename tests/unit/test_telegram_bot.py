@@ -0,0 +1,81 @@
+"""
+Unit tests for the Telegram bot's streamed replies.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, call, patch
+from telegram.error import BadRequest, RetryAfter
+from app.telegram.bot import TelegramBot, _MAX_MESSAGE_LENGTH
+from tests.helpers import stream_chunks
+
+
+@pytest.fixture
+def reply():
+    """Message sent by the bot, editable in place."""
+    message = MagicMock()
+    message.edit_text = AsyncMock()
+    return message
+
+
+@pytest.fixture
+def update(reply):
+    """Incoming update whose replies return the reply fixture."""
+    update = MagicMock()
+    update.message.reply_text = AsyncMock(return_value=reply)
+    return update
+
+
+class TestReplyStreaming:
+    """Test suite for TelegramBot._reply_streaming."""
+    
+    async def test_final_edit_falls_back_to_plain_text(self, update, reply):
+        """Test that rejected Markdown still shows the full text."""
+        reply.edit_text.side_effect = [BadRequest("Can't parse entities"), None]
+        bot = TelegramBot(MagicMock())
+        
+        response = await bot._reply_streaming(update, stream_chunks("Hello ", "*world"))
+        
+        assert response == "Hello *world"
+        assert reply.edit_text.call_args_list == [
+            call("Hello *world", parse_mode="Markdown"),
+            call("Hello *world", parse_mode=None),
+        ]
+    
+    async def test_failed_intermediate_edit_keeps_streaming(self, update, reply):
+        """Test that flood control on an intermediate edit doesn't abort the reply."""
+        reply.edit_text.side_effect = [RetryAfter(1), None, None]
+        bot = TelegramBot(MagicMock())
+        
+        with patch("app.telegram.bot._STREAM_EDIT_INTERVAL", 0):
+            response = await bot._reply_streaming(update, stream_chunks("One", " two", " three"))
+        
+        assert response == "One two three"
+        reply.edit_text.assert_called_with("One two three", parse_mode="Markdown")
+    
+    async def test_long_reply_split_across_messages(self, update, reply):
+        """Test that text over Telegram's limit continues in a new message."""
+        first = "a" * (_MAX_MESSAGE_LENGTH - 10) + "\n"
+        second = "b" * 20
+        bot = TelegramBot(MagicMock())
+        
+        response = await bot._reply_streaming(update, stream_chunks(first, second))
+        
+        assert response == first + second
+        assert reply.edit_text.call_args_list[-2] == call(first[:-1], parse_mode="Markdown")
+        update.message.reply_text.assert_called_with("\n" + second)
+        reply.edit_text.assert_called_with("\n" + second, parse_mode="Markdown")
+    
+    async def test_failure_midway_shows_partial_text_then_raises(self, update, reply):
+        """Test that text streamed before a failure is kept and the error re-raised."""
+        async def interrupted():
+            yield "Hello "
+            yield "world"
+            raise RuntimeError("Connection dropped")
+        
+        bot = TelegramBot(MagicMock())
+        
+        with pytest.raises(RuntimeError):
+            await bot._reply_streaming(update, interrupted())
+        
+        update.message.reply_text.assert_called_once_with("Hello ")
+        reply.edit_text.assert_called_with("Hello world", parse_mode="Markdown")